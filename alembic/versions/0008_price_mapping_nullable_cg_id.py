@@ -0,0 +1,32 @@
+"""allow NULL coingecko_id on price_mappings for negative sentinels
+
+Revision ID: 0008_price_mapping_nullable_cg_id
+Revises: 0007_remove_user_tables
+Create Date: 2026-10-16 10:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0008_price_mapping_nullable_cg_id'
+down_revision = '0007_remove_user_tables'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # batch mode so SQLite can recreate the table to relax the NOT NULL constraint
+    try:
+        with op.batch_alter_table('price_mappings') as batch_op:
+            batch_op.alter_column('coingecko_id', existing_type=sa.String(255), nullable=True)
+    except Exception:
+        pass
+
+
+def downgrade():
+    try:
+        op.execute("DELETE FROM price_mappings WHERE coingecko_id IS NULL")
+        with op.batch_alter_table('price_mappings') as batch_op:
+            batch_op.alter_column('coingecko_id', existing_type=sa.String(255), nullable=False)
+    except Exception:
+        pass
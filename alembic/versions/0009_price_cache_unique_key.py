@@ -0,0 +1,56 @@
+"""add unique index on price_cache (coingecko_id, vs_currency, ts_minute)
+
+Revision ID: 0009_price_cache_unique_key
+Revises: 0008_price_mapping_nullable_cg_id
+Create Date: 2026-10-16 11:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0009_price_cache_unique_key'
+down_revision = '0008_price_mapping_nullable_cg_id'
+branch_labels = None
+depends_on = None
+
+_KEY_COLUMNS = ['coingecko_id', 'vs_currency', 'ts_minute']
+
+
+def _has_unique_key(conn) -> bool:
+    """True if price_cache already enforces uniqueness on the key (e.g. created by create_all)."""
+    insp = sa.inspect(conn)
+    for uc in insp.get_unique_constraints('price_cache'):
+        if uc.get('column_names') == _KEY_COLUMNS:
+            return True
+    for ix in insp.get_indexes('price_cache'):
+        if ix.get('unique') and ix.get('column_names') == _KEY_COLUMNS:
+            return True
+    return False
+
+
+def upgrade():
+    # 0006 created price_cache without the unique key the ORM model declares;
+    # the oracle's ON CONFLICT upsert needs it to exist.
+    conn = op.get_bind()
+    if _has_unique_key(conn):
+        return
+
+    # Rows cached before the key existed may repeat; keep the newest (max id)
+    # per key so the index can be built. Errors are not swallowed: without
+    # this index every price cache upsert fails.
+    op.execute(
+        "DELETE FROM price_cache WHERE id NOT IN ("
+        " SELECT keep_id FROM ("
+        "  SELECT MAX(id) AS keep_id FROM price_cache"
+        "  GROUP BY coingecko_id, vs_currency, ts_minute"
+        " ) AS keep"
+        ")"
+    )
+    op.create_index('uq_pricecache_cg_vs_ts', 'price_cache', _KEY_COLUMNS, unique=True)
+
+
+def downgrade():
+    try:
+        op.drop_index('uq_pricecache_cg_vs_ts', table_name='price_cache')
+    except Exception:
+        pass
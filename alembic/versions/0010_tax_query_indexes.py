@@ -0,0 +1,37 @@
+"""add composite indexes for tax lot and tax summary queries
+
+Revision ID: 0010_tax_query_indexes
+Revises: 0009_price_cache_unique_key
+Create Date: 2026-10-16 12:00:00.000000
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0010_tax_query_indexes'
+down_revision = '0009_price_cache_unique_key'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    try:
+        op.create_index('idx_transaction_wallet_type_created', 'transactions', ['wallet_id', 'tx_type', 'created_at'])
+    except Exception:
+        pass
+
+    try:
+        op.create_index('idx_tax_wallet_year_method', 'tax_records', ['wallet_id', 'year', 'tax_method'])
+    except Exception:
+        pass
+
+
+def downgrade():
+    try:
+        op.drop_index('idx_transaction_wallet_type_created', table_name='transactions')
+    except Exception:
+        pass
+
+    try:
+        op.drop_index('idx_tax_wallet_year_method', table_name='tax_records')
+    except Exception:
+        pass
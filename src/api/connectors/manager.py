@@ -18,7 +18,7 @@ from src.api.connectors.tokens.wrapped_token_detector import WrappedTokenDetecto
 from src.database.manager import get_db_manager
 from src.database.models import ExchangeAccount
 from src.database.models import BlockchainWallet, WalletBalance
-from src.utils.crypto import decrypt_value
+from src.utils.crypto import decrypt_many, decrypt_value
 from src.api.connectors.exchanges.binance_connector import BinanceConnector
 from src.api.connectors.exchanges.coinbase_connector import CoinbaseConnector
 from src.api.connectors.exchanges.kraken_connector import KrakenConnector
@@ -162,8 +162,7 @@ class ConnectorManager:
                             del self._invalid_accounts[acct.id]
 
                     try:
-                        api_key = decrypt_value(acct.api_key_encrypted) or ""
-                        api_secret = decrypt_value(acct.api_secret_encrypted) or ""
+                        api_key, api_secret = (v or "" for v in decrypt_many([acct.api_key_encrypted, acct.api_secret_encrypted]))
 
                         if not api_key or not api_secret:
                             self.logger.warning(f"ExchangeAccount {acct.id} missing decrypted keys, skipping")
@@ -13,7 +13,7 @@ import logging
 from src.auth.dependencies import get_current_user
 from src.database.manager import get_db_manager
 from src.database.models import ExchangeAccount
-from src.utils.crypto import encrypt_value, decrypt_value
+from src.utils.crypto import encrypt_many, decrypt_value
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/v1", tags=["exchanges"])
@@ -40,12 +40,13 @@ async def create_exchange(
     current_user: dict = Depends(get_current_user),
 ):
     dbm = get_db_manager()
+    api_key_encrypted, api_secret_encrypted = encrypt_many([request.api_key, request.api_secret])
     with dbm.session_context() as session:
         account = ExchangeAccount(
             user_id=current_user["user_id"],
             exchange=request.name.lower(),
-            api_key_encrypted=encrypt_value(request.api_key),
-            api_secret_encrypted=encrypt_value(request.api_secret),
+            api_key_encrypted=api_key_encrypted,
+            api_secret_encrypted=api_secret_encrypted,
             label=request.label,
             is_active=True,
         )
@@ -11,8 +11,9 @@ Requires admin/auth in production; for now endpoints are unprotected for conveni
 """
 
 from fastapi import APIRouter, HTTPException, Query, Path, Body
-from typing import Optional, List
-from pydantic import BaseModel, Field
+from typing import Any, Optional, List
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+from sqlalchemy import select
 from src.database.manager import get_db_manager
 from src.database.models import PriceMapping
 from src.utils.time import now_utc
@@ -29,50 +30,56 @@ class PriceMappingIn(BaseModel):
 
 
 class PriceMappingOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     symbol: Optional[str]
     network: Optional[str]
     contract_address: Optional[str]
-    coingecko_id: str
+    coingecko_id: Optional[str]
     source: Optional[str]
     created_at: Optional[str]
 
+    @field_validator("created_at", mode="before")
+    @classmethod
+    def _stringify_created_at(cls, v: Any) -> str:
+        return str(v)
+
+
+# Read paths select plain columns so rows skip the ORM identity map
+_MAPPING_COLUMNS = (
+    PriceMapping.id,
+    PriceMapping.symbol,
+    PriceMapping.network,
+    PriceMapping.contract_address,
+    PriceMapping.coingecko_id,
+    PriceMapping.source,
+    PriceMapping.created_at,
+)
+
 
 @router.get("/", response_model=List[PriceMappingOut])
 def list_mappings(symbol: Optional[str] = Query(None)):
     dbm = get_db_manager()
     with dbm.session_context() as session:
-        q = session.query(PriceMapping)
+        stmt = select(*_MAPPING_COLUMNS)
         if symbol:
-            q = q.filter(PriceMapping.symbol == symbol.upper())
-        results = q.order_by(PriceMapping.created_at.desc()).limit(200).all()
-        return [PriceMappingOut(
-            id=r.id,
-            symbol=r.symbol,
-            network=r.network,
-            contract_address=r.contract_address,
-            coingecko_id=r.coingecko_id,
-            source=r.source,
-            created_at=str(r.created_at)
-        ) for r in results]
+            stmt = stmt.where(PriceMapping.symbol == symbol.upper())
+        stmt = stmt.order_by(PriceMapping.created_at.desc()).limit(200)
+        rows = session.execute(stmt).mappings().all()
+        return [PriceMappingOut.model_validate(dict(r)) for r in rows]
 
 
 @router.get("/by-contract/{contract}", response_model=Optional[PriceMappingOut])
 def get_by_contract(contract: str = Path(...)):
     dbm = get_db_manager()
     with dbm.session_context() as session:
-        r = session.query(PriceMapping).filter_by(contract_address=contract.lower()).first()
+        r = session.execute(
+            select(*_MAPPING_COLUMNS).where(PriceMapping.contract_address == contract.lower())
+        ).mappings().first()
         if not r:
             return None
-        return PriceMappingOut(
-            id=r.id,
-            symbol=r.symbol,
-            network=r.network,
-            contract_address=r.contract_address,
-            coingecko_id=r.coingecko_id,
-            source=r.source,
-            created_at=str(r.created_at)
-        )
+        return PriceMappingOut.model_validate(dict(r))
 
 
 @router.post("/", response_model=PriceMappingOut)
@@ -89,22 +96,14 @@ def create_mapping(payload: PriceMappingIn = Body(...)):
         )
         session.add(pm)
         session.flush()
-        return PriceMappingOut(
-            id=pm.id,
-            symbol=pm.symbol,
-            network=pm.network,
-            contract_address=pm.contract_address,
-            coingecko_id=pm.coingecko_id,
-            source=pm.source,
-            created_at=str(pm.created_at)
-        )
+        return PriceMappingOut.model_validate(pm)
 
 
 @router.put("/{mapping_id}", response_model=PriceMappingOut)
 def update_mapping(mapping_id: int = Path(...), payload: PriceMappingIn = Body(...)):
     dbm = get_db_manager()
     with dbm.session_context() as session:
-        pm = session.query(PriceMapping).filter_by(id=mapping_id).first()
+        pm = session.get(PriceMapping, mapping_id)
         if not pm:
             raise HTTPException(status_code=404, detail="PriceMapping not found")
         if payload.symbol:
@@ -116,22 +115,14 @@ def update_mapping(mapping_id: int = Path(...), payload: PriceMappingIn = Body(.
         pm.coingecko_id = payload.coingecko_id
         pm.source = payload.source
         session.add(pm)
-        return PriceMappingOut(
-            id=pm.id,
-            symbol=pm.symbol,
-            network=pm.network,
-            contract_address=pm.contract_address,
-            coingecko_id=pm.coingecko_id,
-            source=pm.source,
-            created_at=str(pm.created_at)
-        )
+        return PriceMappingOut.model_validate(pm)
 
 
 @router.delete("/{mapping_id}")
 def delete_mapping(mapping_id: int = Path(...)):
     dbm = get_db_manager()
     with dbm.session_context() as session:
-        pm = session.query(PriceMapping).filter_by(id=mapping_id).first()
+        pm = session.get(PriceMapping, mapping_id)
         if not pm:
             raise HTTPException(status_code=404, detail="PriceMapping not found")
         session.delete(pm)
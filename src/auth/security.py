@@ -9,13 +9,37 @@ from datetime import datetime, timedelta, timezone
 from typing import Optional, Dict, Any
 import jwt
 import logging
+import os
 from passlib.context import CryptContext
 from src.utils import ConfigLoader
 
 logger = logging.getLogger(__name__)
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing. TESTING=1 (set by tests/conftest.py) drops the KDF cost
+# to the scheme minimum so auth tests do not spend ~100ms per hash; it must
+# never be set in a deployed environment. Only explicit truthy values count,
+# so TESTING=0 or TESTING=false keep the production cost.
+_TRUTHY = {"1", "true", "yes"}
+
+
+def _testing_enabled() -> bool:
+    return os.getenv("TESTING", "").strip().lower() in _TRUTHY
+
+
+def _build_hash_contexts(testing: bool):
+    """Return (bcrypt context, sha256_crypt fallback context) for the given mode."""
+    bcrypt_ctx = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=4 if testing else 12)
+    # Fallback if the bcrypt backend fails in this env
+    fallback_ctx = CryptContext(
+        schemes=["sha256_crypt"],
+        deprecated="auto",
+        **({"sha256_crypt__rounds": 1000} if testing else {}),
+    )
+    return bcrypt_ctx, fallback_ctx
+
+
+_TESTING = _testing_enabled()
+pwd_context, _fallback_context = _build_hash_contexts(_TESTING)
 
 # JWT config - read from YAML security section (single source of truth)
 cfg = ConfigLoader()
@@ -36,8 +60,7 @@ class SecurityService:
             return pwd_context.hash(password)
         except Exception:
             # Fallback to a safe alternative if bcrypt backend fails in this env
-            alt = CryptContext(schemes=["sha256_crypt"], deprecated="auto")
-            return alt.hash(password)
+            return _fallback_context.hash(password)
 
     @staticmethod
     def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -45,9 +68,8 @@ class SecurityService:
         try:
             return pwd_context.verify(plain_password, hashed_password)
         except Exception:
-            alt = CryptContext(schemes=["sha256_crypt"], deprecated="auto")
             try:
-                return alt.verify(plain_password, hashed_password)
+                return _fallback_context.verify(plain_password, hashed_password)
             except Exception:
                 return False
 
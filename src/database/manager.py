@@ -18,7 +18,7 @@ logger = logging.getLogger(__name__)
 class DatabaseManager:
     """Database connection manager with pooling and lifecycle management"""
 
-    def __init__(self, database_url: str, echo: bool = False, pool_size: int = 20):
+    def __init__(self, database_url: str, echo: bool = False, pool_size: int = 20, query_cache_size: int = 1200):
         """
         Initialize database manager
         
@@ -26,6 +26,7 @@ class DatabaseManager:
             database_url: Connection string (sqlite, postgresql, etc)
             echo: Log SQL statements
             pool_size: Connection pool size (only for PostgreSQL)
+            query_cache_size: Compiled-statement cache entries (SQLAlchemy default 500)
         """
         self.database_url = database_url
         self.echo = echo
@@ -40,6 +41,7 @@ class DatabaseManager:
                 self.engine = create_engine(
                     database_url,
                     echo=echo,
+                    query_cache_size=query_cache_size,
                     connect_args={"check_same_thread": False},
                     poolclass=StaticPool,
                 )
@@ -48,6 +50,7 @@ class DatabaseManager:
                 self.engine = create_engine(
                     database_url,
                     echo=echo,
+                    query_cache_size=query_cache_size,
                     connect_args={"check_same_thread": False},
                     poolclass=NullPool,
                 )
@@ -56,6 +59,7 @@ class DatabaseManager:
             self.engine = create_engine(
                 database_url,
                 echo=echo,
+                query_cache_size=query_cache_size,
                 poolclass=QueuePool,
                 pool_size=pool_size,
                 max_overflow=10,
@@ -70,11 +74,14 @@ class DatabaseManager:
         """Initialize SQLAlchemy event listeners"""
         @event.listens_for(self.engine, "connect")
         def set_sqlite_pragma(dbapi_conn, connection_record):
-            """Enable foreign keys for SQLite connections.
+            """Enable foreign keys and concurrency PRAGMAs for SQLite connections.
 
             Use the engine dialect to determine SQLite instead of checking
-            the URL string. Execute the PRAGMA on the raw DB-API connection
-            for every new connection so FKs are enforced.
+            the URL string. Execute the PRAGMAs on the raw DB-API connection
+            for every new connection so FKs are enforced. File databases also
+            switch to WAL (readers no longer block on a writer), wait up to
+            5s on a locked database instead of failing immediately, and use
+            synchronous=NORMAL, which is safe under WAL.
             """
             try:
                 dialect_name = self.engine.dialect.name
@@ -82,14 +89,27 @@ class DatabaseManager:
                 dialect_name = None
 
             if dialect_name == "sqlite":
+                pragmas = ["PRAGMA foreign_keys=ON"]
+                if not self._is_sqlite_memory():
+                    pragmas += [
+                        "PRAGMA journal_mode=WAL",
+                        "PRAGMA busy_timeout=5000",
+                        "PRAGMA synchronous=NORMAL",
+                    ]
                 # Some DB-API implementations accept .execute directly on the
                 # connection object, others require a cursor. Use both safely.
-                try:
-                    dbapi_conn.execute("PRAGMA foreign_keys=ON")
-                except Exception:
-                    cur = dbapi_conn.cursor()
-                    cur.execute("PRAGMA foreign_keys=ON")
-                    cur.close()
+                for pragma in pragmas:
+                    try:
+                        dbapi_conn.execute(pragma)
+                    except Exception:
+                        cur = dbapi_conn.cursor()
+                        cur.execute(pragma)
+                        cur.close()
+
+    def _is_sqlite_memory(self) -> bool:
+        """Return True for in-memory SQLite URLs (WAL does not apply there)."""
+        database = self.engine.url.database
+        return not database or database == ":memory:" or "mode=memory" in str(self.engine.url)
 
     @staticmethod
     def _mask_url(url: str) -> str:
@@ -56,6 +56,8 @@ class TransactionModel(Base):
         Index("idx_transaction_wallet", "wallet_id"),
         Index("idx_transaction_hash", "tx_hash"),
         Index("idx_transaction_created", "created_at"),
+        # tax lot queries: one wallet, buy- or sell-side tx_types, in date order
+        Index("idx_transaction_wallet_type_created", "wallet_id", "tx_type", "created_at"),
     )
 
     id = Column(Integer, primary_key=True)
@@ -115,6 +117,8 @@ class TaxRecordModel(Base):
         Index("idx_tax_wallet", "wallet_id"),
         Index("idx_tax_year", "year"),
         Index("idx_tax_method", "tax_method"),
+        # yearly summaries filter by wallet and year, then group by method
+        Index("idx_tax_wallet_year_method", "wallet_id", "year", "tax_method"),
     )
 
     id = Column(Integer, primary_key=True)
@@ -309,8 +313,8 @@ class PriceMapping(Base):
     symbol = Column(String(50), nullable=True)  # e.g., 'ETH', 'USDC'
     network = Column(String(50), nullable=True)  # 'ethereum', 'solana', etc
     contract_address = Column(String(255), nullable=True, index=True)  # optional contract for ERC-20
-    coingecko_id = Column(String(255), nullable=False, index=True)
-    source = Column(String(50), nullable=True)  # 'manual', 'coin_gecko_contract', etc
+    coingecko_id = Column(String(255), nullable=True, index=True)  # NULL for 'negative' sentinels
+    source = Column(String(50), nullable=True)  # 'manual', 'coin_gecko_contract', 'negative', etc
     created_at = Column(DateTime, default=now_utc)
 
 
@@ -5,22 +5,30 @@ Exchange Service
 Service responsible for persisting exchange data (balances, trades,
 deposits, withdrawals) into the database.
 """
+import asyncio
 from datetime import datetime, timezone
 from src.utils.time import now_utc
 from decimal import Decimal
+from itertools import islice
 import logging
-from typing import Dict, List, Any, Optional
+from typing import Dict, Iterable, List, Any, Optional, Tuple
+
+from sqlalchemy import insert
 
 from src.database.manager import get_db_manager
 from src.database.models import (
     ExchangeBalance, ExchangeTrade, ExchangeDeposit, ExchangeWithdrawal, ExchangeAccount
 )
-from src.services.price_oracle import get_price, get_price_fiat, get_price_at
+from src.services.price_oracle import get_prices, get_price_at
 from src.utils.config_loader import ConfigLoader
 from src.utils.helpers import Converters
 
 logger = logging.getLogger(__name__)
 
+# Trades are consumed and written in chunks of this size so a long history
+# (e.g. a paginated exchange fetch) never has to be held in memory at once.
+_TRADE_BATCH_SIZE = 500
+
 
 class ExchangeService:
     def __init__(self, db_manager=None):
@@ -51,372 +59,389 @@ class ExchangeService:
             # Non-fatal: mapping upsert should not break exchange persistence
             logger.debug("Failed to upsert PriceMapping (non-fatal)")
 
+    @staticmethod
+    def _require_account(session, exchange_account_id: int):
+        """Raise ValueError unless the ExchangeAccount exists. Expects an active session."""
+        acct = session.query(ExchangeAccount).filter_by(id=exchange_account_id).first()
+        if not acct:
+            raise ValueError(f"ExchangeAccount {exchange_account_id} not found")
+
+    @staticmethod
+    def _parse_ts(value) -> Optional[datetime]:
+        """Parse an exchange timestamp (epoch seconds or ISO string); None when unparseable."""
+        if value is None:
+            return None
+        try:
+            if isinstance(value, int) or isinstance(value, float):
+                return Converters.parse_timestamp(int(value), unit='seconds')
+            return datetime.fromisoformat(str(value))
+        except Exception:
+            return None
+
     def persist_balances(self, exchange_account_id: int, balances: Dict[str, Dict[str, Any]]):
         """Persist exchange balances for the given exchange account.
 
         balances: { 'BTC': {'free': '0.1','locked':'0','total':'0.1'}, ... }
+
+        All snapshot rows are written with a single multi-row INSERT.
         """
         try:
             with self.db_manager.session_context() as session:
-                # Ensure exchange account exists
-                acct = session.query(ExchangeAccount).filter_by(id=exchange_account_id).first()
-                if not acct:
-                    raise ValueError(f"ExchangeAccount {exchange_account_id} not found")
-
-                # Insert snapshot rows
-                for asset, data in balances.items():
-                    free = Decimal(data.get('free', '0'))
-                    locked = Decimal(data.get('locked', '0'))
-                    total = Decimal(data.get('total', str(free + locked)))
-                    # If the exchange provided a contract address, persist mapping
-                    contract = data.get('contract') or data.get('contractAddress') or data.get('tokenAddress')
-                    network = data.get('network') or data.get('chain')
-                    if contract:
-                        try:
-                            self._upsert_price_mapping(session, contract, network=network, symbol=asset)
-                        except Exception:
-                            pass
-                    # attempt to obtain fiat valuation from the input when provided
-                    cfg = ConfigLoader()
-                    configured_fiat = cfg.get_fiat_currency()
-
-                    total_usd = None
-                    total_fiat = None
-
-                    # Accept direct fiat value if provided and matches configured fiat
-                    provided_total_fiat = data.get('total_fiat') or data.get('fiat_total')
-                    provided_fiat_currency = data.get('fiat_currency')
-                    if provided_total_fiat is not None:
-                        try:
-                            if not provided_fiat_currency or provided_fiat_currency.upper() == configured_fiat:
-                                total_fiat = Decimal(str(provided_total_fiat))
-                            else:
-                                total_fiat = None
-                        except Exception:
-                            total_fiat = None
-
-                    # If no provided fiat, compute via price oracle
-                    if total_fiat is None:
-                        try:
-                            price_fiat = get_price_fiat(asset)
-                            total_fiat = Decimal(price_fiat) * total if price_fiat is not None else None
-                        except Exception:
-                            total_fiat = None
-
-                    try:
-                        price_usd = get_price(asset, vs_currency='usd')
-                        total_usd = Decimal(price_usd) * total if price_usd is not None else None
-                    except Exception:
-                        total_usd = None
-
-                    eb = ExchangeBalance(
-                        exchange_account_id=exchange_account_id,
-                        asset=asset,
-                        free=free,
-                        locked=locked,
-                        total=total,
-                        total_usd=total_usd,
-                        total_fiat=total_fiat,
-                        created_at=now_utc()
-                    )
-                    session.add(eb)
-
-                logger.info(f"Persisted {len(balances)} exchange balances for account {exchange_account_id}")
+                self._require_account(session, exchange_account_id)
+                self._write_balances(session, exchange_account_id, balances)
         except Exception as e:
             logger.error(f"Error persisting balances: {e}")
             raise
 
-    def persist_trades(self, exchange_account_id: int, trades: List[Dict[str, Any]]):
+    def _write_balances(self, session, exchange_account_id: int, balances: Dict[str, Dict[str, Any]]):
+        """Insert balance snapshot rows inside an active session."""
+        configured_fiat = ConfigLoader().get_fiat_currency()
+        fiat_vs = (configured_fiat or "EUR").lower()
+        # one batched oracle lookup for every asset instead of two per asset
         try:
-            with self.db_manager.session_context() as session:
-                acct = session.query(ExchangeAccount).filter_by(id=exchange_account_id).first()
-                if not acct:
-                    raise ValueError(f"ExchangeAccount {exchange_account_id} not found")
-
-                for t in trades:
-                    ts = None
-                    if t.get('timestamp') is not None:
-                        try:
-                            if isinstance(t['timestamp'], int) or isinstance(t['timestamp'], float):
-                                ts = Converters.parse_timestamp(int(t['timestamp']), unit='seconds')
-                            else:
-                                ts = datetime.fromisoformat(str(t['timestamp']))
-                        except Exception:
-                            ts = None
-                    trade_id = str(t.get('id')) if t.get('id') is not None else None
-
-                    # If trade_id is present, dedupe by (exchange_account_id, trade_id)
-                    existing = None
-                    if trade_id:
-                        existing = session.query(ExchangeTrade).filter_by(
-                            exchange_account_id=exchange_account_id,
-                            trade_id=trade_id
-                        ).first()
-
-                    if existing:
-                        # update mutable fields if changed
-                        try:
-                            if t.get('price'):
-                                existing.price = Decimal(t.get('price'))
-                            if t.get('qty'):
-                                existing.qty = Decimal(t.get('qty'))
-                            if t.get('commission'):
-                                existing.commission = Decimal(t.get('commission'))
-                        except Exception:
-                            pass
-                        existing.commission_asset = t.get('commissionAsset') or existing.commission_asset
-                        existing.is_buyer = bool(t.get('is_buyer') or t.get('isBuyer') or existing.is_buyer)
-                        existing.is_maker = bool(t.get('is_maker') or t.get('isMaker') or existing.is_maker)
-                        # prefer provided timestamp if present; accept numeric epoch/millis as well
-                        provided_ts = t.get('timestamp')
-                        if provided_ts is not None:
-                            try:
-                                if isinstance(provided_ts, int) or isinstance(provided_ts, float):
-                                    existing.timestamp = Converters.parse_timestamp(int(provided_ts), unit='seconds')
-                                else:
-                                    existing.timestamp = datetime.fromisoformat(str(provided_ts))
-                            except Exception:
-                                existing.timestamp = ts or existing.timestamp
-                        else:
-                            existing.timestamp = ts or existing.timestamp
+            prices = get_prices(balances.keys(), ("usd", fiat_vs))
+        except Exception:
+            prices = {}
+        rows = []
+        for asset, data in balances.items():
+            free = Decimal(data.get('free', '0'))
+            locked = Decimal(data.get('locked', '0'))
+            total = Decimal(data.get('total', str(free + locked)))
+            # If the exchange provided a contract address, persist mapping
+            contract = data.get('contract') or data.get('contractAddress') or data.get('tokenAddress')
+            network = data.get('network') or data.get('chain')
+            if contract:
+                try:
+                    self._upsert_price_mapping(session, contract, network=network, symbol=asset)
+                except Exception:
+                    pass
+            # attempt to obtain fiat valuation from the input when provided
+            total_usd = None
+            total_fiat = None
+
+            # Accept direct fiat value if provided and matches configured fiat
+            provided_total_fiat = data.get('total_fiat') or data.get('fiat_total')
+            provided_fiat_currency = data.get('fiat_currency')
+            if provided_total_fiat is not None:
+                try:
+                    if not provided_fiat_currency or provided_fiat_currency.upper() == configured_fiat:
+                        total_fiat = Decimal(str(provided_total_fiat))
                     else:
-                        trade = ExchangeTrade(
-                            exchange_account_id=exchange_account_id,
-                            trade_id=trade_id,
-                            symbol=t.get('symbol'),
-                            price=Decimal(t.get('price')) if t.get('price') else None,
-                            price_fiat=None,
-                            qty=Decimal(t.get('qty')) if t.get('qty') else None,
-                            commission=Decimal(t.get('commission')) if t.get('commission') else None,
-                            commission_fiat=None,
-                            commission_asset=t.get('commissionAsset'),
-                            is_buyer=bool(t.get('is_buyer') or t.get('isBuyer')),
-                            is_maker=bool(t.get('is_maker') or t.get('isMaker')),
-                            timestamp=ts,
-                            created_at=now_utc()
-                        )
-                        # attempt to compute or accept fiat valuations for the trade price and commission
-                        ts_for_price = None
-                        try:
-                            ts_for_price = int(ts.timestamp()) if ts is not None else None
-                        except Exception:
-                            ts_for_price = None
-
-                        # Prefer any fiat value provided by the exchange
-                        configured_fiat = ConfigLoader().get_fiat_currency()
-                        provided_price_fiat = t.get('price_fiat')
-                        provided_price_fiat_currency = (t.get('price_fiat_currency') or t.get('fiat_currency'))
-                        if provided_price_fiat is not None and (not provided_price_fiat_currency or provided_price_fiat_currency.upper() == configured_fiat):
-                            try:
-                                trade.price_fiat = Decimal(str(provided_price_fiat))
-                            except Exception:
-                                trade.price_fiat = None
-                        else:
-                            try:
-                                sym = t.get('symbol') or (t.get('symbol') or '').split('/')[0]
-                                if trade.price is not None and ts_for_price:
-                                    p = get_price_at(sym, ts_for_price)
-                                    trade.price_fiat = Decimal(p) if p is not None else None
-                            except Exception:
-                                trade.price_fiat = None
-
-                        # Commission fiat: prefer provided
-                        provided_commission_fiat = t.get('commission_fiat')
-                        provided_commission_fiat_currency = t.get('commission_fiat_currency')
-                        if provided_commission_fiat is not None and (not provided_commission_fiat_currency or provided_commission_fiat_currency.upper() == configured_fiat):
-                            try:
-                                trade.commission_fiat = Decimal(str(provided_commission_fiat))
-                            except Exception:
-                                trade.commission_fiat = None
-                        else:
-                            try:
-                                if trade.commission is not None and trade.commission_asset and ts_for_price:
-                                    c = get_price_at(trade.commission_asset, ts_for_price)
-                                    trade.commission_fiat = (Decimal(c) * trade.commission) if c is not None else None
-                            except Exception:
-                                trade.commission_fiat = None
-                        # If trade object has contract info, persist mapping
-                        contract = t.get('contract') or t.get('contractAddress') or t.get('tokenAddress')
-                        network = t.get('network') or t.get('chain')
-                        if contract:
-                            try:
-                                self._upsert_price_mapping(session, contract, network=network, symbol=trade.symbol)
-                            except Exception:
-                                pass
-                        session.add(trade)
-
-                logger.info(f"Persisted {len(trades)} trades for account {exchange_account_id}")
+                        total_fiat = None
+                except Exception:
+                    total_fiat = None
+
+            # If no provided fiat, compute via price oracle
+            if total_fiat is None:
+                try:
+                    price_fiat = prices.get((asset.upper(), fiat_vs))
+                    total_fiat = Decimal(price_fiat) * total if price_fiat is not None else None
+                except Exception:
+                    total_fiat = None
+
+            try:
+                price_usd = prices.get((asset.upper(), "usd"))
+                total_usd = Decimal(price_usd) * total if price_usd is not None else None
+            except Exception:
+                total_usd = None
+
+            rows.append({
+                "exchange_account_id": exchange_account_id,
+                "asset": asset,
+                "free": free,
+                "locked": locked,
+                "total": total,
+                "total_usd": total_usd,
+                "total_fiat": total_fiat,
+                "created_at": now_utc(),
+            })
+
+        if rows:
+            session.execute(insert(ExchangeBalance), rows)
+
+        logger.info(f"Persisted {len(balances)} exchange balances for account {exchange_account_id}")
+
+    def persist_trades(self, exchange_account_id: int, trades: Iterable[Dict[str, Any]]):
+        """Persist trades, deduplicated by (exchange_account_id, trade_id).
+
+        `trades` may be any iterable, including a lazy generator; it is
+        consumed in batches of `_TRADE_BATCH_SIZE`. Per batch, existing
+        trades are loaded with one IN query and updated in place and new
+        trades are written with one executemany INSERT. All batches are
+        committed together.
+        """
+        try:
+            with self.db_manager.session_context() as session:
+                self._require_account(session, exchange_account_id)
+                self._write_trade_batches(session, exchange_account_id, trades)
         except Exception as e:
             logger.error(f"Error persisting trades: {e}")
             raise
 
+    def _write_trade_batches(self, session, exchange_account_id: int, trades: Iterable[Dict[str, Any]]):
+        """Run `_write_trades` over `trades` in chunks, flushing each chunk. Expects an active session."""
+        it = iter(trades)
+        while True:
+            batch = list(islice(it, _TRADE_BATCH_SIZE))
+            if not batch:
+                break
+            self._write_trades(session, exchange_account_id, batch)
+            session.flush()
+
+    def _write_trades(self, session, exchange_account_id: int, trades: List[Dict[str, Any]]):
+        """Insert/update trades inside an active session."""
+        trade_ids = {str(t.get('id')) for t in trades if t.get('id') is not None}
+        existing_by_id = {}
+        if trade_ids:
+            existing_by_id = {
+                et.trade_id: et for et in session.query(ExchangeTrade).filter(
+                    ExchangeTrade.exchange_account_id == exchange_account_id,
+                    ExchangeTrade.trade_id.in_(trade_ids),
+                )
+            }
+
+        configured_fiat = ConfigLoader().get_fiat_currency()
+        new_rows = {}  # trade_id (or a placeholder for id-less trades) -> row
+        for t in trades:
+            ts = self._parse_ts(t.get('timestamp'))
+            trade_id = str(t.get('id')) if t.get('id') is not None else None
+
+            # If trade_id is present, dedupe by (exchange_account_id, trade_id)
+            existing = existing_by_id.get(trade_id) if trade_id else None
+
+            if existing:
+                # update mutable fields if changed
+                try:
+                    if t.get('price'):
+                        existing.price = Decimal(t.get('price'))
+                    if t.get('qty'):
+                        existing.qty = Decimal(t.get('qty'))
+                    if t.get('commission'):
+                        existing.commission = Decimal(t.get('commission'))
+                except Exception:
+                    pass
+                existing.commission_asset = t.get('commissionAsset') or existing.commission_asset
+                existing.is_buyer = bool(t.get('is_buyer') or t.get('isBuyer') or existing.is_buyer)
+                existing.is_maker = bool(t.get('is_maker') or t.get('isMaker') or existing.is_maker)
+                existing.timestamp = ts or existing.timestamp
+            else:
+                trade = {
+                    "exchange_account_id": exchange_account_id,
+                    "trade_id": trade_id,
+                    "symbol": t.get('symbol'),
+                    "price": Decimal(t.get('price')) if t.get('price') else None,
+                    "price_fiat": None,
+                    "qty": Decimal(t.get('qty')) if t.get('qty') else None,
+                    "commission": Decimal(t.get('commission')) if t.get('commission') else None,
+                    "commission_fiat": None,
+                    "commission_asset": t.get('commissionAsset'),
+                    "is_buyer": bool(t.get('is_buyer') or t.get('isBuyer')),
+                    "is_maker": bool(t.get('is_maker') or t.get('isMaker')),
+                    "timestamp": ts,
+                    "created_at": now_utc(),
+                }
+                # attempt to compute or accept fiat valuations for the trade price and commission
+                ts_for_price = None
+                try:
+                    ts_for_price = int(ts.timestamp()) if ts is not None else None
+                except Exception:
+                    ts_for_price = None
+
+                # Prefer any fiat value provided by the exchange
+                provided_price_fiat = t.get('price_fiat')
+                provided_price_fiat_currency = (t.get('price_fiat_currency') or t.get('fiat_currency'))
+                if provided_price_fiat is not None and (not provided_price_fiat_currency or provided_price_fiat_currency.upper() == configured_fiat):
+                    try:
+                        trade["price_fiat"] = Decimal(str(provided_price_fiat))
+                    except Exception:
+                        trade["price_fiat"] = None
+                else:
+                    try:
+                        sym = t.get('symbol') or (t.get('symbol') or '').split('/')[0]
+                        if trade["price"] is not None and ts_for_price:
+                            p = get_price_at(sym, ts_for_price)
+                            trade["price_fiat"] = Decimal(p) if p is not None else None
+                    except Exception:
+                        trade["price_fiat"] = None
+
+                # Commission fiat: prefer provided
+                provided_commission_fiat = t.get('commission_fiat')
+                provided_commission_fiat_currency = t.get('commission_fiat_currency')
+                if provided_commission_fiat is not None and (not provided_commission_fiat_currency or provided_commission_fiat_currency.upper() == configured_fiat):
+                    try:
+                        trade["commission_fiat"] = Decimal(str(provided_commission_fiat))
+                    except Exception:
+                        trade["commission_fiat"] = None
+                else:
+                    try:
+                        if trade["commission"] is not None and trade["commission_asset"] and ts_for_price:
+                            c = get_price_at(trade["commission_asset"], ts_for_price)
+                            trade["commission_fiat"] = (Decimal(c) * trade["commission"]) if c is not None else None
+                    except Exception:
+                        trade["commission_fiat"] = None
+                # If trade object has contract info, persist mapping
+                contract = t.get('contract') or t.get('contractAddress') or t.get('tokenAddress')
+                network = t.get('network') or t.get('chain')
+                if contract:
+                    try:
+                        self._upsert_price_mapping(session, contract, network=network, symbol=trade["symbol"])
+                    except Exception:
+                        pass
+                # a repeated id within one batch keeps the latest payload
+                new_rows[trade_id if trade_id else object()] = trade
+
+        if new_rows:
+            session.execute(insert(ExchangeTrade), list(new_rows.values()))
+
+        logger.info(f"Persisted {len(trades)} trades for account {exchange_account_id}")
+
     def persist_deposits(self, exchange_account_id: int, deposits: List[Dict[str, Any]]):
+        """Persist deposits, deduplicated by (exchange_account_id, deposit_id); new rows use one INSERT."""
+        self._persist_transfers(exchange_account_id, deposits, ExchangeDeposit, "deposit_id", "deposits")
+
+    def persist_withdrawals(self, exchange_account_id: int, withdrawals: List[Dict[str, Any]]):
+        """Persist withdrawals, deduplicated by (exchange_account_id, withdrawal_id); new rows use one INSERT."""
+        self._persist_transfers(exchange_account_id, withdrawals, ExchangeWithdrawal, "withdrawal_id", "withdrawals")
+
+    async def fetch_all_history(self, exchange_async) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Fetch trades, deposits and withdrawals from a `ccxt.async_support` client concurrently.
+
+        The three requests run under one `asyncio.gather`, so the wait is the
+        slowest round-trip rather than the sum of all three. A call that
+        fails (or is unsupported by the exchange) yields an empty list.
+
+        Returns (trades, deposits, withdrawals), ready for `persist_all`.
+        """
+        results = await asyncio.gather(
+            exchange_async.fetch_my_trades(),
+            exchange_async.fetch_deposits(),
+            exchange_async.fetch_withdrawals(),
+            return_exceptions=True,
+        )
+        history = []
+        for kind, result in zip(("trades", "deposits", "withdrawals"), results):
+            if isinstance(result, Exception):
+                logger.warning(f"Could not fetch {kind} from {getattr(exchange_async, 'id', 'exchange')}: {result}")
+                result = []
+            history.append(result or [])
+        return tuple(history)
+
+    def persist_all(
+        self,
+        exchange_account_id: int,
+        *,
+        balances: Optional[Dict[str, Dict[str, Any]]] = None,
+        deposits: Optional[List[Dict[str, Any]]] = None,
+        withdrawals: Optional[List[Dict[str, Any]]] = None,
+        trades: Optional[Iterable[Dict[str, Any]]] = None,
+    ):
+        """Persist any combination of balances, deposits, withdrawals and trades in one transaction.
+
+        Equivalent to calling the individual `persist_*` methods, but the
+        account check runs once and everything is committed together.
+        """
         try:
             with self.db_manager.session_context() as session:
-                acct = session.query(ExchangeAccount).filter_by(id=exchange_account_id).first()
-                if not acct:
-                    raise ValueError(f"ExchangeAccount {exchange_account_id} not found")
-
-                for d in deposits:
-                    ts = None
-                    if d.get('timestamp') is not None:
-                        try:
-                            if isinstance(d['timestamp'], int) or isinstance(d['timestamp'], float):
-                                ts = Converters.parse_timestamp(int(d['timestamp']), unit='seconds')
-                            else:
-                                ts = datetime.fromisoformat(str(d['timestamp']))
-                        except Exception:
-                            ts = None
-                    deposit_id = str(d.get('id')) if d.get('id') is not None else None
-                    existing = None
-                    if deposit_id:
-                        existing = session.query(ExchangeDeposit).filter_by(
-                            exchange_account_id=exchange_account_id,
-                            deposit_id=deposit_id
-                        ).first()
-
-                    if existing:
-                        # update status/txid if changed
-                        existing.status = str(d.get('status')) if d.get('status') is not None else existing.status
-                        existing.txid = d.get('txid') or d.get('txId') or existing.txid
-                        existing.address = d.get('address') or existing.address
-                        try:
-                            if d.get('amount'):
-                                existing.amount = Decimal(d.get('amount'))
-                        except Exception:
-                            pass
-                        existing.timestamp = ts or existing.timestamp
-                    else:
-                        dep = ExchangeDeposit(
-                            exchange_account_id=exchange_account_id,
-                            deposit_id=deposit_id,
-                            asset=d.get('coin') or d.get('asset') or d.get('currency'),
-                            amount=Decimal(d.get('amount')) if d.get('amount') else None,
-                            address=d.get('address'),
-                            txid=d.get('txid') or d.get('txId'),
-                            network=d.get('network'),
-                            status=str(d.get('status')) if d.get('status') is not None else None,
-                            timestamp=ts,
-                            created_at=now_utc()
-                        )
-                        # Accept provided fiat amount if present, else compute via price oracle
-                        cfg = ConfigLoader()
-                        configured_fiat = cfg.get_fiat_currency()
-                        provided_amount_fiat = d.get('amount_fiat') or d.get('fiat_amount')
-                        provided_amount_fiat_currency = d.get('fiat_currency')
-                        if provided_amount_fiat is not None and (not provided_amount_fiat_currency or provided_amount_fiat_currency.upper() == configured_fiat):
-                            try:
-                                dep.amount_fiat = Decimal(str(provided_amount_fiat))
-                            except Exception:
-                                dep.amount_fiat = None
-                        else:
-                            try:
-                                # use deposit timestamp if available
-                                if dep.amount is not None and dep.timestamp is not None:
-                                    when = int(dep.timestamp.timestamp()) if hasattr(dep.timestamp, 'timestamp') else None
-                                    if when:
-                                        p = get_price_at(dep.asset, when)
-                                        dep.amount_fiat = Decimal(p) * dep.amount if p is not None else None
-                            except Exception:
-                                pass
-
-                        session.add(dep)
-
-                        # If deposit includes token contract, persist mapping
-                        d_contract = d.get('contract') or d.get('contractAddress') or d.get('tokenAddress')
-                        d_network = d.get('network') or d.get('chain')
-                        if d_contract:
-                            try:
-                                self._upsert_price_mapping(session, d_contract, network=d_network, symbol=dep.asset)
-                            except Exception:
-                                pass
-
-                logger.info(f"Persisted {len(deposits)} deposits for account {exchange_account_id}")
+                self._require_account(session, exchange_account_id)
+                if balances:
+                    self._write_balances(session, exchange_account_id, balances)
+                if deposits:
+                    self._write_transfers(session, exchange_account_id, deposits, ExchangeDeposit, "deposit_id", "deposits")
+                if withdrawals:
+                    self._write_transfers(session, exchange_account_id, withdrawals, ExchangeWithdrawal, "withdrawal_id", "withdrawals")
+                if trades:
+                    self._write_trade_batches(session, exchange_account_id, trades)
         except Exception as e:
-            logger.error(f"Error persisting deposits: {e}")
+            logger.error(f"Error persisting exchange data: {e}")
             raise
 
-    def persist_withdrawals(self, exchange_account_id: int, withdrawals: List[Dict[str, Any]]):
+    def _persist_transfers(self, exchange_account_id: int, items: List[Dict[str, Any]], model, id_field: str, kind: str):
+        """Shared deposit/withdrawal persistence (both tables have the same shape)."""
         try:
             with self.db_manager.session_context() as session:
-                acct = session.query(ExchangeAccount).filter_by(id=exchange_account_id).first()
-                if not acct:
-                    raise ValueError(f"ExchangeAccount {exchange_account_id} not found")
-
-                for w in withdrawals:
-                    ts = None
-                    if w.get('timestamp') is not None:
-                        try:
-                            if isinstance(w['timestamp'], int) or isinstance(w['timestamp'], float):
-                                ts = Converters.parse_timestamp(int(w['timestamp']), unit='seconds')
-                            else:
-                                ts = datetime.fromisoformat(str(w['timestamp']))
-                        except Exception:
-                            ts = None
-                    withdrawal_id = str(w.get('id')) if w.get('id') is not None else None
-                    existing = None
-                    if withdrawal_id:
-                        existing = session.query(ExchangeWithdrawal).filter_by(
-                            exchange_account_id=exchange_account_id,
-                            withdrawal_id=withdrawal_id
-                        ).first()
-
-                    if existing:
-                        existing.status = str(w.get('status')) if w.get('status') is not None else existing.status
-                        existing.txid = w.get('txid') or w.get('txId') or existing.txid
-                        existing.address = w.get('address') or existing.address
-                        try:
-                            if w.get('amount'):
-                                existing.amount = Decimal(w.get('amount'))
-                        except Exception:
-                            pass
-                        existing.timestamp = ts or existing.timestamp
-                    else:
-                        wd = ExchangeWithdrawal(
-                            exchange_account_id=exchange_account_id,
-                            withdrawal_id=withdrawal_id,
-                            asset=w.get('coin') or w.get('asset') or w.get('currency'),
-                            amount=Decimal(w.get('amount')) if w.get('amount') else None,
-                            address=w.get('address'),
-                            txid=w.get('txid') or w.get('txId'),
-                            network=w.get('network'),
-                            status=str(w.get('status')) if w.get('status') is not None else None,
-                            timestamp=ts,
-                            created_at=now_utc()
-                        )
-                        # Accept provided fiat amount if present, else compute via price oracle
-                        cfg = ConfigLoader()
-                        configured_fiat = cfg.get_fiat_currency()
-                        provided_amount_fiat = w.get('amount_fiat') or w.get('fiat_amount')
-                        provided_amount_fiat_currency = w.get('fiat_currency')
-                        if provided_amount_fiat is not None and (not provided_amount_fiat_currency or provided_amount_fiat_currency.upper() == configured_fiat):
-                            try:
-                                wd.amount_fiat = Decimal(str(provided_amount_fiat))
-                            except Exception:
-                                wd.amount_fiat = None
-                        else:
-                            try:
-                                # use withdrawal timestamp if available
-                                if wd.amount is not None and wd.timestamp is not None:
-                                    when = int(wd.timestamp.timestamp()) if hasattr(wd.timestamp, 'timestamp') else None
-                                    if when:
-                                        p = get_price_at(wd.asset, when)
-                                        wd.amount_fiat = Decimal(p) * wd.amount if p is not None else None
-                            except Exception:
-                                pass
-
-                        session.add(wd)
-
-                        # If withdrawal includes token contract, persist mapping
-                        w_contract = w.get('contract') or w.get('contractAddress') or w.get('tokenAddress')
-                        w_network = w.get('network') or w.get('chain')
-                        if w_contract:
-                            try:
-                                self._upsert_price_mapping(session, w_contract, network=w_network, symbol=wd.asset)
-                            except Exception:
-                                pass
-
-                logger.info(f"Persisted {len(withdrawals)} withdrawals for account {exchange_account_id}")
+                self._require_account(session, exchange_account_id)
+                self._write_transfers(session, exchange_account_id, items, model, id_field, kind)
         except Exception as e:
-            logger.error(f"Error persisting withdrawals: {e}")
+            logger.error(f"Error persisting {kind}: {e}")
             raise
+
+    def _write_transfers(self, session, exchange_account_id: int, items: List[Dict[str, Any]], model, id_field: str, kind: str):
+        """Insert/update deposits or withdrawals inside an active session."""
+        item_ids = {str(d.get('id')) for d in items if d.get('id') is not None}
+        existing_by_id = {}
+        if item_ids:
+            id_col = getattr(model, id_field)
+            existing_by_id = {
+                getattr(row, id_field): row for row in session.query(model).filter(
+                    model.exchange_account_id == exchange_account_id,
+                    id_col.in_(item_ids),
+                )
+            }
+
+        configured_fiat = ConfigLoader().get_fiat_currency()
+        new_rows = {}
+        for d in items:
+            ts = self._parse_ts(d.get('timestamp'))
+            item_id = str(d.get('id')) if d.get('id') is not None else None
+            existing = existing_by_id.get(item_id) if item_id else None
+
+            if existing:
+                # update status/txid if changed
+                existing.status = str(d.get('status')) if d.get('status') is not None else existing.status
+                existing.txid = d.get('txid') or d.get('txId') or existing.txid
+                existing.address = d.get('address') or existing.address
+                try:
+                    if d.get('amount'):
+                        existing.amount = Decimal(d.get('amount'))
+                except Exception:
+                    pass
+                existing.timestamp = ts or existing.timestamp
+            else:
+                row = {
+                    "exchange_account_id": exchange_account_id,
+                    id_field: item_id,
+                    "asset": d.get('coin') or d.get('asset') or d.get('currency'),
+                    "amount": Decimal(d.get('amount')) if d.get('amount') else None,
+                    "amount_fiat": None,
+                    "address": d.get('address'),
+                    "txid": d.get('txid') or d.get('txId'),
+                    "network": d.get('network'),
+                    "status": str(d.get('status')) if d.get('status') is not None else None,
+                    "timestamp": ts,
+                    "created_at": now_utc(),
+                }
+                # Accept provided fiat amount if present, else compute via price oracle
+                provided_amount_fiat = d.get('amount_fiat') or d.get('fiat_amount')
+                provided_amount_fiat_currency = d.get('fiat_currency')
+                if provided_amount_fiat is not None and (not provided_amount_fiat_currency or provided_amount_fiat_currency.upper() == configured_fiat):
+                    try:
+                        row["amount_fiat"] = Decimal(str(provided_amount_fiat))
+                    except Exception:
+                        row["amount_fiat"] = None
+                else:
+                    try:
+                        # use the transfer timestamp if available
+                        if row["amount"] is not None and ts is not None:
+                            when = int(ts.timestamp())
+                            if when:
+                                p = get_price_at(row["asset"], when)
+                                row["amount_fiat"] = Decimal(p) * row["amount"] if p is not None else None
+                    except Exception:
+                        pass
+
+                # a repeated id within one batch keeps the latest payload
+                new_rows[item_id if item_id else object()] = row
+
+                # If the transfer includes token contract, persist mapping
+                d_contract = d.get('contract') or d.get('contractAddress') or d.get('tokenAddress')
+                d_network = d.get('network') or d.get('chain')
+                if d_contract:
+                    try:
+                        self._upsert_price_mapping(session, d_contract, network=d_network, symbol=row["asset"])
+                    except Exception:
+                        pass
+
+        if new_rows:
+            session.execute(insert(model), list(new_rows.values()))
+
+        logger.info(f"Persisted {len(items)} {kind} for account {exchange_account_id}")
@@ -107,10 +107,20 @@ class PortfolioService:
         """
         try:
             with self.db_manager.session_context() as session:
-                query = session.query(WalletModel)
+                # Count transactions per wallet in the same query instead of
+                # lazy-loading every wallet's transaction list (N+1)
+                tx_counts = session.query(
+                    TransactionModel.wallet_id,
+                    func.count(TransactionModel.id).label("tx_count")
+                ).group_by(TransactionModel.wallet_id).subquery()
+                
+                query = session.query(
+                    WalletModel,
+                    func.coalesce(tx_counts.c.tx_count, 0)
+                ).outerjoin(tx_counts, WalletModel.id == tx_counts.c.wallet_id)
                 
                 if network:
-                    query = query.filter_by(network=network)
+                    query = query.filter(WalletModel.network == network)
                 
                 wallets = query.order_by(WalletModel.created_at.desc()).all()
                 
@@ -122,9 +132,9 @@ class PortfolioService:
                         "network": w.network,
                         "label": w.label,
                         "created_at": w.created_at.isoformat(),
-                        "transactions_count": len(w.transactions)
+                        "transactions_count": tx_count
                     }
-                    for w in wallets
+                    for w, tx_count in wallets
                 ]
         except Exception as e:
             logger.error(f"❌ Error getting wallets: {str(e)}")
@@ -155,7 +165,9 @@ class PortfolioService:
                     "network": wallet.network,
                     "label": wallet.label,
                     "created_at": wallet.created_at.isoformat(),
-                    "transactions_count": len(wallet.transactions),
+                    "transactions_count": session.query(func.count(TransactionModel.id)).filter(
+                        TransactionModel.wallet_id == wallet.id
+                    ).scalar(),
                     "latest_update": wallet.updated_at.isoformat()
                 }
         except Exception as e:
@@ -8,11 +8,42 @@ Mapping of common symbols to CoinGecko ids is used (ETH -> ethereum, BTC -> bitc
 The function is defensive and returns None when price can't be resolved.
 """
 
+import asyncio
+import bisect
 import time
 import logging
-from typing import Optional
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timezone
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Optional, Tuple
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from src.utils.config_loader import ConfigLoader
+from src.utils.time import now_utc
+
+try:
+    import aiohttp
+except ImportError:  # bulk lookups fall back to sequential requests
+    aiohttp = None
+
+try:
+    import numpy as np
+except ImportError:  # bulk nearest-point lookups fall back to bisect
+    np = None
+
+# The DB-backed caches are optional: without the database layer the oracle
+# still works against the in-memory caches and the CoinGecko API.
+try:
+    from sqlalchemy import case, select
+    from sqlalchemy.dialects.postgresql import insert as pg_insert
+    from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+    from src.database.manager import get_db_manager
+    from src.database.models import PriceCache, PriceMapping
+except ImportError:
+    get_db_manager = None
 
 _CONFIG = ConfigLoader()
 
@@ -66,31 +97,106 @@ _FALLBACK_SYMBOL_MAP = {
 
 # Build final mapping using YAML tokens first (preferred), falling back to
 # the conservative hardcoded map for symbols not present in YAML.
-SYMBOL_TO_COINGECKO_ID = _FALLBACK_SYMBOL_MAP.copy()
+_symbol_map = _FALLBACK_SYMBOL_MAP.copy()
 try:
-    cfg = ConfigLoader()
-    tokens = cfg.get_tokens() or {}
+    tokens = _CONFIG.get_tokens() or {}
     for sym, info in tokens.items():
         # prefer explicit `coingecko_id` in YAML, otherwise fallback to lowercased symbol
         cg = info.get("coingecko_id") if isinstance(info, dict) else None
         if not cg:
             cg = sym.lower()
-        SYMBOL_TO_COINGECKO_ID[sym.upper()] = cg
+        _symbol_map[sym.upper()] = cg
 except Exception:
     # If config cannot be loaded for any reason, keep the fallback mapping
     logger.debug("Failed to build SYMBOL_TO_COINGECKO_ID from YAML; using fallback mapping")
 
-_CACHE = {}
+# Frozen at import: keys are upper-cased once here and the read-only proxy
+# keeps callers (and test fixtures) from mutating the shared mapping.
+SYMBOL_TO_COINGECKO_ID = MappingProxyType({k.upper(): v for k, v in _symbol_map.items()})
+# Reverse index: CoinGecko id -> every symbol that maps to it.
+_reverse = {}
+for _sym, _cg in SYMBOL_TO_COINGECKO_ID.items():
+    _reverse.setdefault(_cg, []).append(_sym)
+COINGECKO_ID_TO_SYMBOLS = MappingProxyType({cg: tuple(syms) for cg, syms in _reverse.items()})
+del _symbol_map, _reverse
+
+
+class _LRUCache:
+    """Thread-safe bounded LRU mapping of key -> (stored_at, value).
+
+    TTL checks stay with the callers (each lookup knows its own TTL); this
+    class only bounds memory by evicting the least recently used entries.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            self._data.move_to_end(key)
+            return entry
+
+    def __setitem__(self, key, entry):
+        with self._lock:
+            self._data[key] = entry
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
 _CACHE_TTL = 60  # seconds
 _HISTORICAL_CACHE_TTL = 60 * 60  # 1 hour for historical lookups
-_RATE_LIMIT_LAST_CALL = 0.0
+_NEGATIVE_TTL = 60 * 60  # 1 hour for contract addresses no platform resolves
+_NEGATIVE_SOURCE = "negative"  # PriceMapping.source marker for unresolved contracts
+# Separate caches so short-lived latest prices never evict historical entries.
+_LATEST_CACHE = _LRUCache(maxsize=2000)
+_HIST_CACHE = _LRUCache(maxsize=50000)
+_DATE_STR_CACHE = _LRUCache(maxsize=1024)  # UTC day number -> 'dd-mm-YYYY' for /history
+_CONTRACT_ID_CACHE = _LRUCache(maxsize=4096)  # contract address -> resolved coingecko id
+# Leaky bucket: monotonic time of the next free request slot. Callers
+# reserve a slot under the lock and sleep outside it, so concurrent threads
+# queue one interval apart instead of racing past the limit together.
+_RATE_LIMIT_NEXT_ALLOWED = 0.0
+_RATE_LIMIT_LOCK = threading.Lock()
 _RATE_LIMIT_MIN_INTERVAL = None  # seconds between calls, computed from config
+# Shared HTTP session so TCP/TLS connections to CoinGecko are reused across
+# calls. Transient 429/5xx responses are retried with a short backoff.
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=20,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504]),
+))
+_BULK_MAX_CONNECTIONS = 25  # cap on concurrent CoinGecko connections for bulk lookups
+# Max distance between the first and last minute key merged into one bulk
+# range request. With the +/- 1 hour padding the window stays within a day,
+# where CoinGecko still returns 5-minute granularity.
+_BULK_MAX_WINDOW_SPAN = 22 * 60 * 60
+
+# CoinGecko endpoint templates, filled in with str.format per request.
+_COINGECKO_API = "https://api.coingecko.com/api/v3"
+_SIMPLE_PRICE_URL = _COINGECKO_API + "/simple/price?ids={ids}&vs_currencies={vs}"
+_RANGE_URL = _COINGECKO_API + "/coins/{cg_id}/market_chart/range?vs_currency={vs}&from={frm}&to={to}"
+_CONTRACT_URL = _COINGECKO_API + "/coins/{platform}/contract/{addr}"
+_HISTORY_URL = _COINGECKO_API + "/coins/{cg_id}/history?date={date}"
 
 
 def _fetch_prices(ids: str, vs_currency: str = "usd"):
-    url = f"https://api.coingecko.com/api/v3/simple/price?ids={ids}&vs_currencies={vs_currency}"
+    url = _SIMPLE_PRICE_URL.format(ids=ids, vs=vs_currency)
     try:
-        resp = requests.get(url, timeout=10)
+        resp = _SESSION.get(url, timeout=10)
         resp.raise_for_status()
         return resp.json()
     except Exception as e:
@@ -98,9 +204,9 @@ def _fetch_prices(ids: str, vs_currency: str = "usd"):
         return {}
 
 
-def _ensure_rate_limit():
-    """Ensure minimum interval between external CoinGecko calls based on config."""
-    global _RATE_LIMIT_LAST_CALL, _RATE_LIMIT_MIN_INTERVAL
+def _rate_limit_interval() -> float:
+    """Return the minimum interval between CoinGecko calls, computed once from config."""
+    global _RATE_LIMIT_MIN_INTERVAL
     if _RATE_LIMIT_MIN_INTERVAL is None:
         # compute from config (requests per minute)
         try:
@@ -111,13 +217,77 @@ def _ensure_rate_limit():
             _RATE_LIMIT_MIN_INTERVAL = 60.0 / float(rl)
         except Exception:
             _RATE_LIMIT_MIN_INTERVAL = 6.0
+    return _RATE_LIMIT_MIN_INTERVAL
 
-    now = time.time()
-    elapsed = now - _RATE_LIMIT_LAST_CALL
-    if elapsed < _RATE_LIMIT_MIN_INTERVAL:
-        to_sleep = _RATE_LIMIT_MIN_INTERVAL - elapsed
-        time.sleep(to_sleep)
-    _RATE_LIMIT_LAST_CALL = time.time()
+
+def _reserve_rate_limit_slot() -> float:
+    """Claim the next CoinGecko request slot and return how long to wait for it."""
+    global _RATE_LIMIT_NEXT_ALLOWED
+    interval = _rate_limit_interval()
+    with _RATE_LIMIT_LOCK:
+        now = time.monotonic()
+        slot = max(_RATE_LIMIT_NEXT_ALLOWED, now)
+        _RATE_LIMIT_NEXT_ALLOWED = slot + interval
+    return slot - now
+
+
+def _ensure_rate_limit():
+    """Ensure minimum interval between external CoinGecko calls based on config."""
+    delay = _reserve_rate_limit_slot()
+    if delay > 0:
+        time.sleep(delay)
+
+
+async def _ensure_rate_limit_async():
+    """Async counterpart of `_ensure_rate_limit`: spaces request starts without blocking the loop.
+
+    Draws from the same slot schedule as the sync path so both respect the
+    same configured CoinGecko budget.
+    """
+    delay = _reserve_rate_limit_slot()
+    if delay > 0:
+        await asyncio.sleep(delay)
+
+
+def _price_cache_select(cg_id: str, vs_currency: str, ts_min: int):
+    """SELECT of just the cached price column; read paths skip hydrating PriceCache rows."""
+    return select(PriceCache.price).where(
+        PriceCache.coingecko_id == cg_id,
+        PriceCache.vs_currency == vs_currency,
+        PriceCache.ts_minute == ts_min,
+    )
+
+
+def _upsert_price_cache(session, cg_id: str, vs_currency: str, ts_min: int, price: Optional[float]):
+    """Insert or update a PriceCache row in one statement.
+
+    Uses ON CONFLICT on the (coingecko_id, vs_currency, ts_minute) unique
+    constraint for PostgreSQL and SQLite; other dialects fall back to
+    SELECT-then-INSERT/UPDATE.
+    """
+    fetched_at = now_utc()
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        insert_fn = pg_insert
+    elif dialect == "sqlite":
+        insert_fn = sqlite_insert
+    else:
+        existing = session.query(PriceCache).filter_by(coingecko_id=cg_id, vs_currency=vs_currency, ts_minute=ts_min).first()
+        if existing:
+            existing.price = price
+            existing.fetched_at = fetched_at
+        else:
+            session.add(PriceCache(coingecko_id=cg_id, vs_currency=vs_currency, ts_minute=ts_min, price=price, fetched_at=fetched_at))
+        return
+
+    stmt = insert_fn(PriceCache).values(
+        coingecko_id=cg_id, vs_currency=vs_currency, ts_minute=ts_min, price=price, fetched_at=fetched_at
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["coingecko_id", "vs_currency", "ts_minute"],
+        set_={"price": stmt.excluded.price, "fetched_at": stmt.excluded.fetched_at},
+    )
+    session.execute(stmt)
 
 
 def get_price(symbol: str, vs_currency: str = "usd") -> Optional[float]:
@@ -131,24 +301,23 @@ def get_price(symbol: str, vs_currency: str = "usd") -> Optional[float]:
 
     cache_key = f"{cg_id}:{vs_currency}"
     now = time.time()
-    entry = _CACHE.get(cache_key)
+    entry = _LATEST_CACHE.get(cache_key)
     if entry and now - entry[0] < _CACHE_TTL:
         return entry[1]
 
     # First consult DB-backed cache if available
-    try:
-        from src.database.manager import get_db_manager
-        from src.database.models import PriceCache, PriceMapping
-        dbm = get_db_manager()
-        # check cache for latest value (ts_minute = current minute)
-        ts_min = int(time.time() // 60 * 60)
-        with dbm.session_context() as session:
-            cached = session.query(PriceCache).filter_by(coingecko_id=cg_id, vs_currency=vs_currency, ts_minute=ts_min).first()
-            if cached and cached.price is not None:
-                return float(cached.price)
-    except Exception:
-        # DB not available or error; fallback to API
-        pass
+    if get_db_manager is not None:
+        try:
+            dbm = get_db_manager()
+            # check cache for latest value (ts_minute = current minute)
+            ts_min = int(time.time() // 60 * 60)
+            with dbm.session_context() as session:
+                cached = session.execute(_price_cache_select(cg_id, vs_currency, ts_min)).scalar()
+                if cached is not None:
+                    return float(cached)
+        except Exception:
+            # DB not available or error; fallback to API
+            pass
 
     data = _fetch_prices(cg_id, vs_currency=vs_currency)
     price = None
@@ -158,24 +327,17 @@ def get_price(symbol: str, vs_currency: str = "usd") -> Optional[float]:
         except Exception:
             price = None
 
-    _CACHE[cache_key] = (now, price)
+    _LATEST_CACHE[cache_key] = (now, price)
 
     # persist to DB cache
-    try:
-        from src.database.manager import get_db_manager
-        from src.database.models import PriceCache
-        dbm = get_db_manager()
-        ts_min = int(time.time() // 60 * 60)
-        with dbm.session_context() as session:
-            existing = session.query(PriceCache).filter_by(coingecko_id=cg_id, vs_currency=vs_currency, ts_minute=ts_min).first()
-            if existing:
-                existing.price = price
-                existing.fetched_at = now_utc()
-            else:
-                pc = PriceCache(coingecko_id=cg_id, vs_currency=vs_currency, ts_minute=ts_min, price=price)
-                session.add(pc)
-    except Exception:
-        pass
+    if get_db_manager is not None:
+        try:
+            dbm = get_db_manager()
+            ts_min = int(time.time() // 60 * 60)
+            with dbm.session_context() as session:
+                _upsert_price_cache(session, cg_id, vs_currency, ts_min, price)
+        except Exception:
+            pass
     return price
 
 
@@ -185,18 +347,100 @@ def get_price_fiat(symbol: str) -> Optional[float]:
     return get_price(symbol, vs_currency=fiat.lower())
 
 
+def get_prices(symbols: Iterable[str], vs_currencies: Iterable[str] = ("usd",)) -> Dict[Tuple[str, str], Optional[float]]:
+    """Return latest prices for many symbols as {(SYMBOL, vs_currency): price}.
+
+    Same caches as `get_price`, but whatever is not fresh in memory is read
+    from the DB cache with one query and fetched with one /simple/price
+    request (CoinGecko accepts comma-separated ids and currencies).
+    Unknown symbols map to None.
+    """
+    vs_list = list(dict.fromkeys(v.lower() for v in vs_currencies))
+    ids_by_symbol = {}
+    for symbol in symbols:
+        if symbol:
+            s = symbol.upper()
+            ids_by_symbol[s] = SYMBOL_TO_COINGECKO_ID.get(s)
+
+    now = time.time()
+    found = {}
+    missing = set()
+    for cg_id in set(filter(None, ids_by_symbol.values())):
+        for vs in vs_list:
+            entry = _LATEST_CACHE.get(f"{cg_id}:{vs}")
+            if entry and now - entry[0] < _CACHE_TTL:
+                found[(cg_id, vs)] = entry[1]
+            else:
+                missing.add((cg_id, vs))
+    if missing:
+        found.update(_fetch_latest_prices(missing, now))
+
+    return {
+        (s, vs): found.get((cg_id, vs)) if cg_id else None
+        for s, cg_id in ids_by_symbol.items()
+        for vs in vs_list
+    }
+
+
+def _fetch_latest_prices(pairs, now: float) -> Dict[Tuple[str, str], Optional[float]]:
+    """Resolve (cg_id, vs) pairs via the DB cache, then one API request; fills the caches."""
+    ts_min = int(now // 60 * 60)
+    out = {}
+    dbm = None
+    if get_db_manager is not None:
+        try:
+            dbm = get_db_manager()
+            with dbm.session_context() as session:
+                rows = session.execute(
+                    select(PriceCache.coingecko_id, PriceCache.vs_currency, PriceCache.price).where(
+                        PriceCache.coingecko_id.in_({cg_id for cg_id, _ in pairs}),
+                        PriceCache.vs_currency.in_({vs for _, vs in pairs}),
+                        PriceCache.ts_minute == ts_min,
+                    )
+                ).all()
+            for cg_id, vs, price in rows:
+                if (cg_id, vs) in pairs and price is not None:
+                    out[(cg_id, vs)] = float(price)
+                    _LATEST_CACHE[f"{cg_id}:{vs}"] = (now, float(price))
+        except Exception:
+            # DB not available or error; fallback to API
+            dbm = None
+
+    remaining = [pair for pair in pairs if pair not in out]
+    if not remaining:
+        return out
+
+    ids = sorted({cg_id for cg_id, _ in remaining})
+    vss = sorted({vs for _, vs in remaining})
+    data = _fetch_prices(",".join(ids), vs_currency=",".join(vss))
+    for cg_id, vs in remaining:
+        try:
+            price = float(data[cg_id][vs])
+        except Exception:
+            price = None
+        out[(cg_id, vs)] = price
+        _LATEST_CACHE[f"{cg_id}:{vs}"] = (now, price)
+
+    # persist to DB cache in one transaction
+    if dbm is not None:
+        try:
+            with dbm.session_context() as session:
+                for cg_id, vs in remaining:
+                    _upsert_price_cache(session, cg_id, vs, ts_min, out[(cg_id, vs)])
+        except Exception:
+            pass
+    return out
+
+
 def _fetch_price_range(cg_id: str, vs_currency: str, from_unix: int, to_unix: int):
     """Fetch price series from CoinGecko market_chart/range and return list of prices.
 
     Returns list of [ts_ms, price] or None on failure.
     """
-    url = (
-        f"https://api.coingecko.com/api/v3/coins/{cg_id}/market_chart/range"
-        f"?vs_currency={vs_currency}&from={from_unix}&to={to_unix}"
-    )
+    url = _RANGE_URL.format(cg_id=cg_id, vs=vs_currency, frm=from_unix, to=to_unix)
     try:
         _ensure_rate_limit()
-        resp = requests.get(url, timeout=15)
+        resp = _SESSION.get(url, timeout=15)
         resp.raise_for_status()
         data = resp.json()
         prices = data.get("prices", [])
@@ -208,6 +452,357 @@ def _fetch_price_range(cg_id: str, vs_currency: str, from_unix: int, to_unix: in
         return None
 
 
+async def _fetch_price_range_async(http, cg_id: str, vs_currency: str, from_unix: int, to_unix: int):
+    """Async variant of `_fetch_price_range` over a shared aiohttp ClientSession."""
+    url = _RANGE_URL.format(cg_id=cg_id, vs=vs_currency, frm=from_unix, to=to_unix)
+    try:
+        await _ensure_rate_limit_async()
+        async with http.get(url, timeout=aiohttp.ClientTimeout(total=15)) as resp:
+            resp.raise_for_status()
+            data = await resp.json()
+        prices = data.get("prices", [])
+        if not prices:
+            return None
+        return prices
+    except Exception as e:
+        logger.debug(f"CoinGecko async range fetch failed for {cg_id}: {e}")
+        return None
+
+
+async def _fetch_price_ranges_async(specs: List[Tuple[str, str, int, int]]):
+    """Fetch several market_chart/range windows concurrently.
+
+    One ClientSession (and its connection pool) is shared by all requests so
+    TCP/TLS setup is paid once.
+    """
+    connector = aiohttp.TCPConnector(limit=_BULK_MAX_CONNECTIONS)
+    async with aiohttp.ClientSession(connector=connector) as http:
+        return await asyncio.gather(*[
+            _fetch_price_range_async(http, cg_id, vs, from_unix, to_unix)
+            for cg_id, vs, from_unix, to_unix in specs
+        ])
+
+
+def _fetch_price_ranges(specs: List[Tuple[str, str, int, int]]):
+    """Fetch several range windows, concurrently when aiohttp is available.
+
+    Safe to call with an event loop already running in this thread (e.g.
+    from an async route): the fetch then gets its own loop on a worker
+    thread instead of `asyncio.run` raising RuntimeError.
+    """
+    if aiohttp is None:
+        return [_fetch_price_range(*spec) for spec in specs]
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(_fetch_price_ranges_async(specs))
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(lambda: asyncio.run(_fetch_price_ranges_async(specs))).result()
+
+
+def _nearest_price(prices, ts_list, when_ms: int) -> float:
+    """Return the price of the point in `prices` closest to `when_ms`.
+
+    CoinGecko returns [ts_ms, price] points sorted by timestamp, so the
+    neighbours of `when_ms` are found by bisecting `ts_list` (the
+    precomputed timestamps of `prices`). Ties go to the earlier point.
+    """
+    i = bisect.bisect_left(ts_list, when_ms)
+    if i == 0:
+        return float(prices[0][1])
+    if i == len(prices):
+        return float(prices[-1][1])
+    if when_ms - ts_list[i - 1] <= ts_list[i] - when_ms:
+        return float(prices[i - 1][1])
+    return float(prices[i][1])
+
+
+def _nearest_prices(prices, when_ms_list) -> List[float]:
+    """Vectorised `_nearest_price` for many query timestamps against one range."""
+    if np is None:
+        ts_list = [p[0] for p in prices]
+        return [_nearest_price(prices, ts_list, when_ms) for when_ms in when_ms_list]
+    ts_arr = np.array([p[0] for p in prices], dtype=np.int64)
+    px_arr = np.array([p[1] for p in prices], dtype=np.float64)
+    q = np.asarray(when_ms_list, dtype=np.int64)
+    idx = np.searchsorted(ts_arr, q)
+    left = np.clip(idx - 1, 0, len(ts_arr) - 1)
+    right = np.clip(idx, 0, len(ts_arr) - 1)
+    pick = np.where(q - ts_arr[left] <= ts_arr[right] - q, left, right)
+    return px_arr[pick].tolist()
+
+
+def _history_date(ts: int) -> str:
+    """Return the UTC 'dd-mm-YYYY' date CoinGecko's /history expects, memoized per day."""
+    day = ts // 86400
+    date_str = _DATE_STR_CACHE.get(day)
+    if date_str is None:
+        date_str = time.strftime('%d-%m-%Y', time.gmtime(day * 86400))
+        _DATE_STR_CACHE[day] = date_str
+    return date_str
+
+
+def _is_fresh_negative(pm) -> bool:
+    """Return True if a negative PriceMapping sentinel is still within `_NEGATIVE_TTL`."""
+    created = pm.created_at
+    if created is None:
+        return False
+    if created.tzinfo is None:
+        created = created.replace(tzinfo=timezone.utc)
+    return (now_utc() - created).total_seconds() < _NEGATIVE_TTL
+
+
+# CoinGecko platform slugs probed for contract lookups, in order of likelihood.
+_CONTRACT_PLATFORMS = (
+    "ethereum",
+    "polygon-pos",
+    "binance-smart-chain",
+    "arbitrum-one",
+    "avalanche",
+    "base",
+    "solana",
+)
+
+# Conservative builtin slug -> network map; YAML `platform_aliases` override it.
+_BUILTIN_PLATFORM_ALIASES = {
+    "polygon-pos": "polygon",
+    "binance-smart-chain": "bsc",
+    "arbitrum-one": "arbitrum",
+    "avalanche": "avalanche",
+    "base": "base",
+    "ethereum": "ethereum",
+    "solana": "solana",
+}
+
+
+def _resolve_platform_network(slug: str, merged: dict, avail) -> str:
+    """Map a CoinGecko platform slug to our config network name."""
+    # prefer explicit alias if it exists in config and is available
+    candidate = merged.get(slug)
+    if candidate and candidate in avail:
+        return candidate
+
+    # otherwise, if slug itself matches a network key, return it
+    if slug in avail:
+        return slug
+
+    # as a last resort, try simplified slug (strip suffixes)
+    simple = slug.split("-")[0]
+    if simple in avail:
+        return simple
+
+    # fallback to mapped alias even if not in available networks
+    if candidate:
+        return candidate
+
+    # final fallback to original slug
+    return slug
+
+
+def _build_platform_to_network() -> dict:
+    """Resolve every known platform slug once against the loaded config."""
+    try:
+        aliases = _CONFIG.get_platform_aliases()
+    except Exception:
+        aliases = {}
+    try:
+        avail = set(_CONFIG.get_available_networks())
+    except Exception:
+        avail = set()
+
+    # Merge: YAML overrides builtin
+    merged = dict(_BUILTIN_PLATFORM_ALIASES)
+    merged.update(aliases or {})
+    slugs = set(_CONTRACT_PLATFORMS) | set(merged)
+    return {slug: _resolve_platform_network(slug, merged, avail) for slug in slugs}
+
+
+_PLATFORM_TO_NETWORK = _build_platform_to_network()
+
+
+def reload_platform_map():
+    """Rebuild the platform -> network table (e.g. after tests change the config)."""
+    global _PLATFORM_TO_NETWORK
+    _PLATFORM_TO_NETWORK = _build_platform_to_network()
+
+
+def _probe_contract(address: str):
+    """Resolve a contract address via CoinGecko's per-platform contract endpoint.
+
+    Returns (coingecko_id, platform_slug, conclusive). `conclusive` is False
+    when any platform failed for a reason other than a clean 404 (rate limit,
+    server error, network failure), in which case a miss must not be cached.
+    """
+    # Try multiple CoinGecko platform slugs in order of likelihood.
+    # The platform slug will be persisted in PriceMapping.network so
+    # it can be used later. If a platform does not support the
+    # address lookup, the request will typically 404 and we move on.
+    try:
+        _ensure_rate_limit()
+    except Exception:
+        return None, None, False
+
+    conclusive = True
+    for platform in _CONTRACT_PLATFORMS:
+        try:
+            url = _CONTRACT_URL.format(platform=platform, addr=address)
+            resp = _SESSION.get(url, timeout=10)
+            if resp.status_code == 200:
+                data = resp.json()
+                cg_id = data.get("id")
+                if cg_id:
+                    return cg_id, platform, True
+                break
+            if resp.status_code != 404:
+                conclusive = False
+        except Exception:
+            # try next platform
+            conclusive = False
+            continue
+    return None, None, conclusive
+
+
+def _mapping_preference():
+    """ORDER BY terms ranking an address's PriceMapping rows: real mappings first, then newest."""
+    return (
+        case((PriceMapping.source == _NEGATIVE_SOURCE, 1), else_=0),
+        PriceMapping.created_at.desc(),
+        PriceMapping.id.desc(),
+    )
+
+
+def _lookup_mapping(session, address: str):
+    """Return the preferred PriceMapping row for a contract address, or None. Expects an active session.
+
+    Non-negative mappings win over a negative sentinel, then the newest row,
+    so a stale sentinel never shadows a real mapping.
+    """
+    if session is None:
+        return None
+    try:
+        with session.no_autoflush:
+            return (
+                session.query(PriceMapping)
+                .filter_by(contract_address=address)
+                .order_by(*_mapping_preference())
+                .first()
+            )
+    except Exception as e:
+        logger.debug(f"PriceMapping lookup failed for {address}: {e}")
+        return None
+
+
+def _persist_mapping(session, address: str, network: Optional[str], cg_id: Optional[str], source: str):
+    """Upsert the PriceMapping for a contract address. Expects an active session.
+
+    A resolved id updates the address's existing row (same network first,
+    then a negative sentinel, then the newest row) instead of adding a
+    duplicate, and drops any other sentinels. Manual mappings are never
+    overwritten. A negative sentinel is only written while the address has
+    no real mapping, and an address keeps at most one sentinel.
+    """
+    if session is None:
+        return
+    try:
+        rows = (
+            session.query(PriceMapping)
+            .filter_by(contract_address=address)
+            .order_by(*_mapping_preference())
+            .all()
+        )
+        real = [pm for pm in rows if pm.source != _NEGATIVE_SOURCE]
+        sentinels = [pm for pm in rows if pm.source == _NEGATIVE_SOURCE]
+
+        if source == _NEGATIVE_SOURCE:
+            if real:
+                return
+            target = sentinels[0] if sentinels else None
+        else:
+            if any(pm.source == "manual" for pm in real):
+                return
+            target = next((pm for pm in real if pm.network == network), None) or (sentinels or real or [None])[0]
+            for pm in sentinels:
+                if pm is not target:
+                    session.delete(pm)
+
+        if target is not None:
+            # rows carrying a symbol are keyed by (symbol, network); keep their network
+            if target.symbol is None:
+                target.network = network
+            target.coingecko_id = cg_id
+            target.source = source
+            target.created_at = now_utc()
+        else:
+            session.add(PriceMapping(symbol=None, network=network, contract_address=address, coingecko_id=cg_id, source=source, created_at=now_utc()))
+    except Exception as e:
+        logger.debug(f"PriceMapping persist failed for {address}: {e}")
+
+
+def _read_cache(session, cg_id: str, vs_currency: str, ts_min: int) -> Optional[float]:
+    """Return the DB-cached price for (cg_id, vs_currency, ts_min), or None. Expects an active session."""
+    if session is None:
+        return None
+    try:
+        with session.no_autoflush:
+            price = session.execute(_price_cache_select(cg_id, vs_currency, ts_min)).scalar()
+        if price is not None:
+            return float(price)
+    except Exception as e:
+        logger.debug(f"PriceCache read failed for {cg_id}: {e}")
+    return None
+
+
+def _write_cache(session, cg_id: str, vs_currency: str, ts_min: int, price: Optional[float]):
+    """Upsert a price into the DB cache. Expects an active session."""
+    if session is None:
+        return
+    try:
+        _upsert_price_cache(session, cg_id, vs_currency, ts_min, price)
+    except Exception as e:
+        logger.warning(f"PriceCache write failed for {cg_id}: {e}")
+
+
+_MISSING = object()
+
+
+def _is_contract_address(symbol: str) -> bool:
+    # simple heuristic for Ethereum-style contract addresses
+    return isinstance(symbol, str) and symbol.startswith("0x") and len(symbol) >= 40
+
+
+def _hist_cache_key(cg_id: str, vs: str, when_ts: int) -> Tuple[str, int]:
+    """Return the `_HIST_CACHE` key and the minute bucket for a historical lookup."""
+    key_ts = int(when_ts // 60 * 60)
+    return f"hist:{cg_id}:{vs}:{key_ts}", key_ts
+
+
+def _memo_price_at(symbol: str, when_ts: int, vs_currency: Optional[str]):
+    """Answer `get_price_at` from the in-process caches alone, or return `_MISSING`.
+
+    Hits here skip opening a DB session: the id comes from the static
+    symbol map or a previously resolved contract, the price from
+    `_HIST_CACHE` (same minute bucket and TTL as `get_price_at`).
+    """
+    now = time.time()
+    cg_id = SYMBOL_TO_COINGECKO_ID.get(symbol.upper())
+    if not cg_id and _is_contract_address(symbol):
+        address = symbol.lower()
+        neg_entry = _HIST_CACHE.get(f"neg:{address}")
+        if neg_entry and now - neg_entry[0] < _NEGATIVE_TTL:
+            return None
+        id_entry = _CONTRACT_ID_CACHE.get(address)
+        if id_entry and now - id_entry[0] < _HISTORICAL_CACHE_TTL:
+            cg_id = id_entry[1]
+    if not cg_id:
+        return _MISSING
+
+    vs = (vs_currency or (_CONFIG.get_fiat_currency() or "EUR")).lower()
+    entry = _HIST_CACHE.get(_hist_cache_key(cg_id, vs, when_ts)[0])
+    if entry and now - entry[0] < _HISTORICAL_CACHE_TTL:
+        return entry[1]
+    return _MISSING
+
+
 def get_price_at(symbol: str, when_ts: int, vs_currency: str = None) -> Optional[float]:
     """Return price for `symbol` at UNIX timestamp `when_ts` (seconds).
 
@@ -216,148 +811,127 @@ def get_price_at(symbol: str, when_ts: int, vs_currency: str = None) -> Optional
     - Try market_chart/range with a +/- 1 hour window and pick nearest timestamp
     - If that fails, fall back to /coins/{id}/history?date=DD-MM-YYYY which gives day-level price
     - Cache results keyed by cg_id:vs_currency:when_ts (rounded to minute)
+
+    DB access is split into short sessions: one read (mapping and price
+    cache lookup) before any network call and one write afterwards to
+    persist what was fetched. No session or connection is held while
+    CoinGecko is queried or the rate limiter sleeps.
     """
     if not symbol:
         return None
-    s = symbol.upper()
-    cg_id = SYMBOL_TO_COINGECKO_ID.get(s)
-    # If symbol not in static mapping and symbol looks like a contract address, try DB mapping or CoinGecko contract endpoint
-    if not cg_id:
-        # simple heuristic for Ethereum-style contract addresses
-        if isinstance(symbol, str) and symbol.startswith("0x") and len(symbol) >= 40:
-            try:
-                from src.database.manager import get_db_manager
-                from src.database.models import PriceMapping
-                dbm = get_db_manager()
-                with dbm.session_context() as session:
-                    pm = session.query(PriceMapping).filter_by(contract_address=symbol.lower()).first()
-                    if pm:
-                        cg_id = pm.coingecko_id
-            except Exception:
-                cg_id = None
-
-            # if still missing, try CoinGecko contract lookup and persist mapping
-            if not cg_id:
-                try:
-                    _ensure_rate_limit()
-                    # Try multiple CoinGecko platform slugs in order of likelihood.
-                    # The platform slug will be persisted in PriceMapping.network so
-                    # it can be used later. If a platform does not support the
-                    # address lookup, the request will typically 404 and we move on.
-                    platforms = [
-                        "ethereum",
-                        "polygon-pos",
-                        "binance-smart-chain",
-                        "arbitrum-one",
-                        "avalanche",
-                        "base",
-                        "solana",
-                    ]
-                    for platform in platforms:
-                        try:
-                            url = f"https://api.coingecko.com/api/v3/coins/{platform}/contract/{symbol.lower()}"
-                            resp = requests.get(url, timeout=10)
-                            if resp.status_code == 200:
-                                data = resp.json()
-                                cg_id = data.get("id")
-                                if cg_id:
-                                    # Map CoinGecko platform slug to our config network name
-                                    try:
-                                        from src.utils.config_loader import ConfigLoader
-                                        cfg = ConfigLoader()
-
-                                        def _platform_to_network(slug: str) -> str:
-                                            # Start from configurable aliases in YAML, falling
-                                            # back to a small conservative builtin map.
-                                            try:
-                                                aliases = _CONFIG.get_platform_aliases()
-                                            except Exception:
-                                                aliases = {}
-
-                                            builtin = {
-                                                "polygon-pos": "polygon",
-                                                "binance-smart-chain": "bsc",
-                                                "arbitrum-one": "arbitrum",
-                                                "avalanche": "avalanche",
-                                                "base": "base",
-                                                "ethereum": "ethereum",
-                                                "solana": "solana",
-                                            }
-
-                                            # Merge: YAML overrides builtin
-                                            merged = builtin.copy()
-                                            merged.update(aliases or {})
-
-                                            # prefer explicit alias if it exists in config and is available
-                                            candidate = merged.get(slug)
-                                            avail = _CONFIG.get_available_networks()
-                                            if candidate and candidate in avail:
-                                                return candidate
-
-                                            # otherwise, if slug itself matches a network key, return it
-                                            if slug in avail:
-                                                return slug
-
-                                            # as a last resort, try simplified slug (strip suffixes)
-                                            simple = slug.split("-")[0]
-                                            if simple in avail:
-                                                return simple
-
-                                            # fallback to mapped alias even if not in available networks
-                                            if candidate:
-                                                return candidate
-
-                                            # final fallback to original slug
-                                            return slug
-
-                                        mapped_network = _platform_to_network(platform)
-                                    except Exception:
-                                        mapped_network = platform
-
-                                    # persist mapping with mapped network name (or platform slug)
-                                    try:
-                                        from src.database.manager import get_db_manager
-                                        from src.database.models import PriceMapping
-                                        dbm = get_db_manager()
-                                        with dbm.session_context() as session:
-                                            pm = PriceMapping(symbol=None, network=mapped_network, contract_address=symbol.lower(), coingecko_id=cg_id, source="coin_gecko_contract")
-                                            session.add(pm)
-                                    except Exception:
-                                        pass
-                                break
-                        except Exception:
-                            # try next platform
-                            continue
-                except Exception:
-                    cg_id = None
+    memo = _memo_price_at(symbol, when_ts, vs_currency)
+    if memo is not _MISSING:
+        return memo
+
+    dbm = None
+    if get_db_manager is not None:
+        try:
+            dbm = get_db_manager()
+        except Exception:
+            # DB not available; resolve against in-memory caches and the API only
+            dbm = None
+
+    cg_id = SYMBOL_TO_COINGECKO_ID.get(symbol.upper())
+    address = None
     if not cg_id:
+        if not _is_contract_address(symbol):
+            return None
+        address = symbol.lower()
+        id_entry = _CONTRACT_ID_CACHE.get(address)
+        if id_entry and time.time() - id_entry[0] < _HISTORICAL_CACHE_TTL:
+            cg_id = id_entry[1]
+    vs = (vs_currency or (_CONFIG.get_fiat_currency() or "EUR")).lower()
+
+    # 1. short read session: contract mapping and DB price cache
+    cg_id, cached = _in_session(
+        dbm, lambda session: _read_price_state(session, address, cg_id, vs, when_ts), (cg_id, _MISSING), symbol
+    )
+    if address and cg_id is None and cached is None:
+        # fresh negative sentinel persisted by another worker
+        _HIST_CACHE[f"neg:{address}"] = (time.time(), None)
         return None
 
-    fiat = vs_currency or (_CONFIG.get_fiat_currency() or "EUR")
-    vs = fiat.lower()
+    # 2. network, no session open: contract probe, then the price itself
+    mapping = None
+    if not cg_id:
+        cg_id, platform, conclusive = _probe_contract(address)
+        if cg_id:
+            mapping = (_PLATFORM_TO_NETWORK.get(platform, platform), cg_id, "coin_gecko_contract")
+        elif conclusive:
+            _HIST_CACHE[f"neg:{address}"] = (time.time(), None)
+            # persist a sentinel so other workers skip the probe too
+            mapping = (None, None, _NEGATIVE_SOURCE)
+    if address and cg_id:
+        _CONTRACT_ID_CACHE[address] = (time.time(), cg_id)
+
+    price = None
+    key_ts = None
+    if cg_id:
+        cache_key, key_ts = _hist_cache_key(cg_id, vs, when_ts)
+        if cached is _MISSING and mapping is not None:
+            # newly resolved contract: the DB may already cache its price
+            cached = _in_session(dbm, lambda session: _read_cache(session, cg_id, vs, key_ts), None, symbol)
+        if cached is not _MISSING and cached is not None:
+            _HIST_CACHE[cache_key] = (time.time(), cached)
+            price = cached
+            key_ts = None  # nothing new to persist
+        else:
+            price = _fetch_price_at(cg_id, vs, key_ts, int(when_ts * 1000))
+            _HIST_CACHE[cache_key] = (time.time(), price)
+
+    # 3. short write session: persist the resolved mapping and fetched price
+    if mapping is not None or (key_ts is not None and price is not None):
+        def _persist(session):
+            if mapping is not None:
+                _persist_mapping(session, address, *mapping)
+            if key_ts is not None and price is not None:
+                _write_cache(session, cg_id, vs, key_ts, price)
+        _in_session(dbm, _persist, None, symbol)
+    return price
 
-    # round timestamp to minute for caching stability
-    key_ts = int(when_ts // 60 * 60)
-    when_ms = int(when_ts * 1000)
-    cache_key = f"hist:{cg_id}:{vs}:{key_ts}"
-    now = time.time()
-    entry = _CACHE.get(cache_key)
-    if entry and now - entry[0] < _HISTORICAL_CACHE_TTL:
-        return entry[1]
 
-    # Consult DB-backed cache first
+def _in_session(dbm, fn, default, symbol: str):
+    """Run `fn(session)` in its own short session and return its result.
+
+    Without a DB manager `fn(None)` runs directly. A failed session (e.g. a
+    commit error) only loses DB cache reads/writes, so `default` is returned
+    and the lookup carries on.
+    """
+    if dbm is None:
+        return fn(None)
+    result = default
     try:
-        from src.database.manager import get_db_manager
-        from src.database.models import PriceCache
-        dbm = get_db_manager()
         with dbm.session_context() as session:
-            pc = session.query(PriceCache).filter_by(coingecko_id=cg_id, vs_currency=vs, ts_minute=key_ts).first()
-            if pc and pc.price is not None:
-                _CACHE[cache_key] = (now, float(pc.price))
-                return float(pc.price)
-    except Exception:
-        pass
+            result = fn(session)
+    except Exception as e:
+        logger.debug(f"Price cache session failed for {symbol}: {e}")
+        return default
+    return result
 
+
+def _read_price_state(session, address: Optional[str], cg_id: Optional[str], vs: str, when_ts: int):
+    """Read phase of `get_price_at`. Expects an active session (or None).
+
+    Returns (cg_id, cached): `cached` is the DB-cached price or `_MISSING`.
+    (None, None) means a fresh negative sentinel says the contract does not
+    resolve; (None, _MISSING) means the contract still has to be probed.
+    """
+    if not cg_id and address:
+        pm = _lookup_mapping(session, address)
+        if pm is not None:
+            if pm.source == _NEGATIVE_SOURCE:
+                if _is_fresh_negative(pm):
+                    return None, None
+            else:
+                cg_id = pm.coingecko_id
+    if not cg_id:
+        return None, _MISSING
+    cached = _read_cache(session, cg_id, vs, _hist_cache_key(cg_id, vs, when_ts)[1])
+    return cg_id, (_MISSING if cached is None else cached)
+
+
+def _fetch_price_at(cg_id: str, vs: str, key_ts: int, when_ms: int) -> Optional[float]:
+    """Fetch one historical price from CoinGecko (range first, then /history). No DB access."""
     # try market_chart range +/- 1 hour
     from_unix = max(0, key_ts - 3600)
     to_unix = key_ts + 3600
@@ -365,56 +939,131 @@ def get_price_at(symbol: str, when_ts: int, vs_currency: str = None) -> Optional
         prices = _fetch_price_range(cg_id, vs, from_unix, to_unix)
         if prices:
             # find nearest by comparing milliseconds to the requested time (ms)
-            nearest = min(prices, key=lambda p: abs(int(p[0]) - when_ms))
-            price = float(nearest[1])
-            _CACHE[cache_key] = (now, price)
-            # persist into DB cache
-            try:
-                from src.database.manager import get_db_manager
-                from src.database.models import PriceCache
-                dbm = get_db_manager()
-                with dbm.session_context() as session:
-                    existing = session.query(PriceCache).filter_by(coingecko_id=cg_id, vs_currency=vs, ts_minute=key_ts).first()
-                    if existing:
-                        existing.price = price
-                        existing.fetched_at = now_utc()
-                    else:
-                        session.add(PriceCache(coingecko_id=cg_id, vs_currency=vs, ts_minute=key_ts, price=price))
-            except Exception:
-                pass
-            return price
+            return _nearest_price(prices, [p[0] for p in prices], when_ms)
     except Exception:
         pass
 
     # fallback to /history (day-level)
+    date_str = _history_date(key_ts)
     try:
-        date_str = time.strftime('%d-%m-%Y', time.gmtime(key_ts))
-        url = f"https://api.coingecko.com/api/v3/coins/{cg_id}/history?date={date_str}"
-        resp = requests.get(url, timeout=15)
+        url = _HISTORY_URL.format(cg_id=cg_id, date=date_str)
+        resp = _SESSION.get(url, timeout=15)
         resp.raise_for_status()
         data = resp.json()
         market = data.get('market_data', {})
         current_price = market.get('current_price', {})
         if vs in current_price:
-            price = float(current_price[vs])
-            _CACHE[cache_key] = (now, price)
-            # persist into DB cache
-            try:
-                from src.database.manager import get_db_manager
-                from src.database.models import PriceCache
-                dbm = get_db_manager()
-                with dbm.session_context() as session:
-                    existing = session.query(PriceCache).filter_by(coingecko_id=cg_id, vs_currency=vs, ts_minute=key_ts).first()
-                    if existing:
-                        existing.price = price
-                        existing.fetched_at = now_utc()
-                    else:
-                        session.add(PriceCache(coingecko_id=cg_id, vs_currency=vs, ts_minute=key_ts, price=price))
-            except Exception:
-                pass
-            return price
+            return float(current_price[vs])
     except Exception as e:
         logger.debug(f"CoinGecko history fetch failed for {cg_id} date {date_str}: {e}")
-
-    _CACHE[cache_key] = (now, None)
     return None
+
+
+def get_prices_at_bulk(symbol_ts_pairs: Iterable[Tuple[str, int]], vs_currency: str = None) -> List[Optional[float]]:
+    """Return historical prices for many (symbol, when_ts) pairs, in input order.
+
+    Pairs already cached (in memory or in the DB) are answered directly. The
+    rest are grouped per coin into windows of up to a day, each fetched with
+    a single market_chart/range request; windows are fetched concurrently
+    over one aiohttp session and resolved with one vectorised nearest-point
+    lookup per window (numpy when available). Symbols that are not in
+    SYMBOL_TO_COINGECKO_ID (e.g. contract addresses) and windows that return
+    no data go through `get_price_at`.
+
+    DB access happens in two short sessions (cache read, then cache write)
+    with the network fetch in between, as in `get_price_at`. Blocking: when
+    called with an event loop running, the fetch runs on a worker thread.
+    """
+    pairs = list(symbol_ts_pairs)
+    results: List[Optional[float]] = [None] * len(pairs)
+    fiat = vs_currency or (_CONFIG.get_fiat_currency() or "EUR")
+    vs = fiat.lower()
+
+    fallback = []
+    pending = {}  # (cg_id, key_ts) -> [(index, when_ms), ...]
+    now = time.time()
+    for idx, (symbol, when_ts) in enumerate(pairs):
+        cg_id = SYMBOL_TO_COINGECKO_ID.get(symbol.upper()) if symbol else None
+        if not cg_id:
+            fallback.append(idx)
+            continue
+        key_ts = int(when_ts // 60 * 60)
+        entry = _HIST_CACHE.get(f"hist:{cg_id}:{vs}:{key_ts}")
+        if entry and now - entry[0] < _HISTORICAL_CACHE_TTL:
+            results[idx] = entry[1]
+            continue
+        pending.setdefault((cg_id, key_ts), []).append((idx, int(when_ts * 1000)))
+
+    dbm = None
+    if pending and get_db_manager is not None:
+        try:
+            dbm = get_db_manager()
+        except Exception:
+            dbm = None
+
+    # 1. short read session: answer what the DB cache already knows
+    def _read(session):
+        return {key: _read_cache(session, key[0], vs, key[1]) for key in pending}
+
+    cached = _in_session(dbm, _read, {}, "bulk lookup") if pending else {}
+    for key, price in cached.items():
+        if price is not None:
+            cg_id, key_ts = key
+            _HIST_CACHE[f"hist:{cg_id}:{vs}:{key_ts}"] = (now, price)
+            for idx, _ in pending.pop(key):
+                results[idx] = price
+
+    # 2. network, no session open: merge each coin's minute keys into windows
+    # spanning at most _BULK_MAX_WINDOW_SPAN so one range request answers
+    # many timestamps
+    by_coin = {}
+    for cg_id, key_ts in pending:
+        by_coin.setdefault(cg_id, []).append(key_ts)
+    windows = []  # [(cg_id, [key_ts, ...]), ...]
+    for cg_id, keys in by_coin.items():
+        keys.sort()
+        group = [keys[0]]
+        for key_ts in keys[1:]:
+            if key_ts - group[0] <= _BULK_MAX_WINDOW_SPAN:
+                group.append(key_ts)
+            else:
+                windows.append((cg_id, group))
+                group = [key_ts]
+        windows.append((cg_id, group))
+
+    to_write = []  # [(cg_id, key_ts, price), ...]
+    if windows:
+        try:
+            ranges = _fetch_price_ranges([(cg_id, vs, max(0, keys[0] - 3600), keys[-1] + 3600) for cg_id, keys in windows])
+        except Exception as e:
+            logger.warning(f"Bulk range fetch failed, falling back to per-pair lookups: {e}")
+            ranges = [None] * len(windows)
+        for (cg_id, keys), prices in zip(windows, ranges):
+            if not prices:
+                continue
+            queries = [(key_ts, idx, when_ms) for key_ts in keys for idx, when_ms in pending[(cg_id, key_ts)]]
+            found = _nearest_prices(prices, [when_ms for _, _, when_ms in queries])
+            per_key = {}
+            for (key_ts, idx, _), price in zip(queries, found):
+                results[idx] = price
+                per_key[key_ts] = price
+            for key_ts, price in per_key.items():
+                _HIST_CACHE[f"hist:{cg_id}:{vs}:{key_ts}"] = (now, price)
+                to_write.append((cg_id, key_ts, price))
+                del pending[(cg_id, key_ts)]
+
+    # 3. short write session: persist the fetched prices
+    if to_write:
+        def _write(session):
+            for cg_id, key_ts, price in to_write:
+                _write_cache(session, cg_id, vs, key_ts, price)
+        _in_session(dbm, _write, None, "bulk lookup")
+
+    # whatever is still unresolved (no range data, failed fetch) goes through get_price_at
+    for entries in pending.values():
+        fallback.extend(idx for idx, _ in entries)
+
+    for idx in sorted(fallback):
+        symbol, when_ts = pairs[idx]
+        results[idx] = get_price_at(symbol, when_ts, vs_currency)
+    return results
@@ -17,6 +17,7 @@ import json
 from src.database.models import (
     WalletModel, TransactionModel, BalanceModel, TaxRecordModel
 )
+from src.services.tax_calculator import ESTIMATED_TAX_RATE, estimate_tax, exact_sum
 
 logger = logging.getLogger(__name__)
 
@@ -267,45 +268,32 @@ class ReportGenerator:
         """
         try:
             with self.db_manager.session_context() as session:
-                query = session.query(TaxRecordModel).filter(
+                # One aggregate row per method; totals are folded from those rows
+                query = session.query(
+                    TaxRecordModel.tax_method,
+                    func.count(TaxRecordModel.id).label("count"),
+                    exact_sum(session, TaxRecordModel.gain_loss).label("gain_loss"),
+                    exact_sum(session, TaxRecordModel.cost_basis).label("cost_basis"),
+                    exact_sum(session, TaxRecordModel.proceeds).label("proceeds"),
+                ).filter(
                     TaxRecordModel.wallet_id == wallet_id,
                     TaxRecordModel.year == year
                 )
                 
                 if tax_method:
-                    query = query.filter_by(tax_method=tax_method)
+                    query = query.filter(TaxRecordModel.tax_method == tax_method)
                 
-                tax_records = query.all()
+                by_method = {row.tax_method: row for row in query.group_by(TaxRecordModel.tax_method)}
                 
                 # Summarize
-                total_gain_loss = Decimal("0")
-                total_cost_basis = Decimal("0")
-                total_proceeds = Decimal("0")
-                
-                by_method = {}
-                
-                for record in tax_records:
-                    total_gain_loss += record.gain_loss
-                    total_cost_basis += record.cost_basis
-                    total_proceeds += record.proceeds
-                    
-                    method = record.tax_method
-                    if method not in by_method:
-                        by_method[method] = {
-                            "count": 0,
-                            "gain_loss": Decimal("0"),
-                            "cost_basis": Decimal("0"),
-                            "proceeds": Decimal("0")
-                        }
-                    
-                    by_method[method]["count"] += 1
-                    by_method[method]["gain_loss"] += record.gain_loss
-                    by_method[method]["cost_basis"] += record.cost_basis
-                    by_method[method]["proceeds"] += record.proceeds
+                total_records = sum(row.count for row in by_method.values())
+                total_gain_loss = sum((row.gain_loss for row in by_method.values()), Decimal("0"))
+                total_cost_basis = sum((row.cost_basis for row in by_method.values()), Decimal("0"))
+                total_proceeds = sum((row.proceeds for row in by_method.values()), Decimal("0"))
                 
                 # US federal tax rate (can be parameterized)
-                tax_rate = Decimal("0.21")  # Long-term capital gains
-                estimated_tax = total_gain_loss * tax_rate
+                tax_rate = ESTIMATED_TAX_RATE  # Long-term capital gains
+                estimated_tax = estimate_tax(total_gain_loss)
                 
                 logger.info(f"✅ Tax report generated for {year}")
                 
@@ -315,7 +303,7 @@ class ReportGenerator:
                     "wallet_id": wallet_id,
                     "year": year,
                     "summary": {
-                        "total_transactions": len(tax_records),
+                        "total_transactions": total_records,
                         "total_gain_loss": str(total_gain_loss),
                         "total_cost_basis": str(total_cost_basis),
                         "total_proceeds": str(total_proceeds),
@@ -324,10 +312,10 @@ class ReportGenerator:
                     },
                     "by_method": {
                         method: {
-                            "transaction_count": data["count"],
-                            "gain_loss": str(data["gain_loss"]),
-                            "cost_basis": str(data["cost_basis"]),
-                            "proceeds": str(data["proceeds"])
+                            "transaction_count": data.count,
+                            "gain_loss": str(data.gain_loss),
+                            "cost_basis": str(data.cost_basis),
+                            "proceeds": str(data.proceeds)
                         }
                         for method, data in by_method.items()
                     }
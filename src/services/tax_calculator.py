@@ -6,11 +6,15 @@ Tax calculation service with multiple methods.
 Implements FIFO, LIFO, and Average Cost methods.
 """
 
+from sqlalchemy import Integer, cast, extract, func, type_coerce
+from sqlalchemy.types import TypeDecorator
 from sqlalchemy.orm import Session
+from bisect import bisect_left, bisect_right
 from decimal import Decimal
 from datetime import datetime, timezone
+from itertools import accumulate
 from src.utils.time import now_utc
-from typing import List, Dict, Any, Tuple, Optional
+from typing import List, Dict, Any, Iterator, Sequence, Tuple, Optional
 import logging
 
 from src.database.models import (
@@ -19,6 +23,74 @@ from src.database.models import (
 
 logger = logging.getLogger(__name__)
 
+# Shared zero for the per-slice `or` defaults in the matching loops
+_ZERO = Decimal("0")
+
+# Flat rate behind every `estimated_tax_usd` figure (US long-term capital gains)
+ESTIMATED_TAX_RATE = Decimal("0.21")
+
+
+def estimate_tax(gain_loss: Decimal) -> Decimal:
+    """Estimated tax owed on a net gain/loss at `ESTIMATED_TAX_RATE`."""
+    return gain_loss * ESTIMATED_TAX_RATE
+
+
+# Decimal places of the Numeric(30, 8) money columns summed by `exact_sum`
+_MONEY_SCALE = 10 ** 8
+
+
+class _ScaledSum(TypeDecorator):
+    """Integer sum of 1e-8 units, returned as a Decimal."""
+    impl = Integer
+    cache_ok = True
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else Decimal(value) / _MONEY_SCALE
+
+
+def exact_sum(session: Session, column):
+    """SUM() of a Numeric(30, 8) money column that comes back as an exact Decimal.
+
+    SQLite has no exact NUMERIC arithmetic and sums these columns as floats,
+    so there each row is scaled to whole 1e-8 units and summed as integers
+    (the same per-row rounding the ORM applies when loading the value).
+    Other backends sum NUMERIC exactly already.
+    """
+    if session.get_bind().dialect.name == "sqlite":
+        return type_coerce(func.sum(cast(func.round(column * _MONEY_SCALE), Integer)), _ScaledSum())
+    return func.sum(column)
+
+
+def _match_lots(lot_amounts: Sequence[Decimal], sell_amounts: Sequence[Decimal]) -> Iterator[Tuple[int, int, Decimal]]:
+    """Allocate sells against lots consumed in order (FIFO/LIFO depending on lot order).
+
+    Yields `(sell_index, lot_index, amount)` for every non-empty slice and
+    `(sell_index, -1, shortfall)` when a sell exceeds the remaining lots.
+    Lot boundaries are prefix sums, so each sell finds its first and last
+    lot with a binary search instead of walking lots one by one; amounts
+    stay Decimal so cost bases match the Numeric columns exactly. Lots with
+    no positive amount (corrections, over-sold lots) are clamped to zero so
+    the prefix sums stay non-decreasing and simply never match.
+    """
+    bounds = list(accumulate(max(amount, _ZERO) for amount in lot_amounts))
+    available = bounds[-1] if bounds else _ZERO
+    consumed = _ZERO
+
+    for sell_index, quantity in enumerate(sell_amounts):
+        if quantity <= 0:
+            continue
+        start, end = consumed, consumed + quantity
+        first = bisect_right(bounds, start)
+        last = min(bisect_left(bounds, end), len(bounds) - 1)
+        for lot_index in range(first, last + 1):
+            lower = bounds[lot_index - 1] if lot_index else _ZERO
+            amount = min(bounds[lot_index], end) - max(lower, start)
+            if amount > 0:
+                yield sell_index, lot_index, amount
+        consumed = min(end, available)
+        if end > available:
+            yield sell_index, -1, end - max(start, available)
+
 
 class TaxCalculator:
     """Tax calculation service"""
@@ -50,7 +122,7 @@ class TaxCalculator:
                 buy_query = session.query(TransactionModel).filter(
                     TransactionModel.wallet_id == wallet_id,
                     TransactionModel.tx_type.in_(["buy", "transfer_in"]),
-                    TransactionModel.created_at.year == year
+                    extract("year", TransactionModel.created_at) == year
                 ).order_by(TransactionModel.created_at.asc())
                 
                 if token:
@@ -62,7 +134,7 @@ class TaxCalculator:
                 sell_query = session.query(TransactionModel).filter(
                     TransactionModel.wallet_id == wallet_id,
                     TransactionModel.tx_type.in_(["sell", "swap", "transfer_out"]),
-                    TransactionModel.created_at.year == year
+                    extract("year", TransactionModel.created_at) == year
                 ).order_by(TransactionModel.created_at.asc())
                 
                 if token:
@@ -78,48 +150,38 @@ class TaxCalculator:
                 total_proceeds = Decimal("0")
                 tax_records = []
                 
-                cost_basis_per_unit = Decimal("0")
-                remaining_buy_amount = Decimal("0")
-                buy_index = 0
-                
-                for sell_tx in sell_transactions:
-                    remaining_to_sell = sell_tx.amount_in if sell_tx.amount_in else Decimal("0")
+                # read each row's amount and price once, not once per matched slice
+                lot_amounts = [buy_tx.amount_out or _ZERO for buy_tx in buy_transactions]
+                lot_prices = [buy_tx.price_usd_in or _ZERO for buy_tx in buy_transactions]
+                sell_amounts = [sell_tx.amount_in or _ZERO for sell_tx in sell_transactions]
+                sell_prices = [sell_tx.price_usd_out or _ZERO for sell_tx in sell_transactions]
+
+                for sell_index, buy_index, sell_amount in _match_lots(lot_amounts, sell_amounts):
+                    sell_tx = sell_transactions[sell_index]
+                    if buy_index < 0:
+                        logger.warning(f"⚠️  Insufficient cost basis for FIFO calculation on {sell_tx.tx_hash}")
+                        continue
+
+                    cost_basis = sell_amount * lot_prices[buy_index]
+                    proceeds = sell_amount * sell_prices[sell_index]
+                    gain_loss = proceeds - cost_basis
                     
-                    while remaining_to_sell > 0 and buy_index < len(buy_transactions):
-                        buy_tx = buy_transactions[buy_index]
-                        available_to_sell = (buy_tx.amount_out or Decimal("0")) - remaining_buy_amount
-                        
-                        if available_to_sell <= 0:
-                            buy_index += 1
-                            remaining_buy_amount = Decimal("0")
-                            continue
-                        
-                        sell_amount = min(remaining_to_sell, available_to_sell)
-                        cost_basis = sell_amount * (buy_tx.price_usd_in or Decimal("0"))
-                        proceeds = sell_amount * (sell_tx.price_usd_out or Decimal("0"))
-                        gain_loss = proceeds - cost_basis
-                        
-                        total_gain_loss += gain_loss
-                        total_cost_basis += cost_basis
-                        total_proceeds += proceeds
-                        
-                        # Create tax record
-                        tax_record = TaxRecordModel(
-                            wallet_id=wallet_id,
-                            transaction_id=sell_tx.id,
-                            gain_loss=gain_loss,
-                            cost_basis=cost_basis,
-                            proceeds=proceeds,
-                            tax_method="FIFO",
-                            year=year
-                        )
-                        session.add(tax_record)
-                        
-                        remaining_to_sell -= sell_amount
-                        remaining_buy_amount += sell_amount
+                    total_gain_loss += gain_loss
+                    total_cost_basis += cost_basis
+                    total_proceeds += proceeds
                     
-                    if remaining_to_sell > 0:
-                        logger.warning(f"⚠️  Insufficient cost basis for FIFO calculation on {sell_tx.tx_hash}")
+                    # Create tax record
+                    tax_record = TaxRecordModel(
+                        wallet_id=wallet_id,
+                        transaction_id=sell_tx.id,
+                        gain_loss=gain_loss,
+                        cost_basis=cost_basis,
+                        proceeds=proceeds,
+                        tax_method="FIFO",
+                        year=year
+                    )
+                    session.add(tax_record)
+                    tax_records.append(tax_record)
                 
                 session.flush()
                 
@@ -132,7 +194,7 @@ class TaxCalculator:
                     "total_cost_basis": str(total_cost_basis),
                     "total_proceeds": str(total_proceeds),
                     "tax_records_count": len(tax_records),
-                    "estimated_tax_usd": str(total_gain_loss * Decimal("0.21"))  # Typical rate
+                    "estimated_tax_usd": str(estimate_tax(total_gain_loss))
                 }
         except Exception as e:
             logger.error(f"❌ Error calculating FIFO: {str(e)}")
@@ -156,7 +218,7 @@ class TaxCalculator:
                 buy_query = session.query(TransactionModel).filter(
                     TransactionModel.wallet_id == wallet_id,
                     TransactionModel.tx_type.in_(["buy", "transfer_in"]),
-                    TransactionModel.created_at.year == year
+                    extract("year", TransactionModel.created_at) == year
                 ).order_by(TransactionModel.created_at.desc())
                 
                 if token:
@@ -168,7 +230,7 @@ class TaxCalculator:
                 sell_query = session.query(TransactionModel).filter(
                     TransactionModel.wallet_id == wallet_id,
                     TransactionModel.tx_type.in_(["sell", "swap", "transfer_out"]),
-                    TransactionModel.created_at.year == year
+                    extract("year", TransactionModel.created_at) == year
                 ).order_by(TransactionModel.created_at.asc())
                 
                 if token:
@@ -182,44 +244,35 @@ class TaxCalculator:
                 total_cost_basis = Decimal("0")
                 total_proceeds = Decimal("0")
                 
-                buy_index = 0
-                remaining_buy_amount = Decimal("0")
-                
-                for sell_tx in sell_transactions:
-                    remaining_to_sell = sell_tx.amount_in if sell_tx.amount_in else Decimal("0")
+                # read each row's amount and price once, not once per matched slice
+                lot_amounts = [buy_tx.amount_out or _ZERO for buy_tx in buy_transactions]
+                lot_prices = [buy_tx.price_usd_in or _ZERO for buy_tx in buy_transactions]
+                sell_amounts = [sell_tx.amount_in or _ZERO for sell_tx in sell_transactions]
+                sell_prices = [sell_tx.price_usd_out or _ZERO for sell_tx in sell_transactions]
+
+                for sell_index, buy_index, sell_amount in _match_lots(lot_amounts, sell_amounts):
+                    if buy_index < 0:
+                        continue
+                    sell_tx = sell_transactions[sell_index]
+                    cost_basis = sell_amount * lot_prices[buy_index]
+                    proceeds = sell_amount * sell_prices[sell_index]
+                    gain_loss = proceeds - cost_basis
+                    
+                    total_gain_loss += gain_loss
+                    total_cost_basis += cost_basis
+                    total_proceeds += proceeds
                     
-                    while remaining_to_sell > 0 and buy_index < len(buy_transactions):
-                        buy_tx = buy_transactions[buy_index]
-                        available_to_sell = (buy_tx.amount_out or Decimal("0")) - remaining_buy_amount
-                        
-                        if available_to_sell <= 0:
-                            buy_index += 1
-                            remaining_buy_amount = Decimal("0")
-                            continue
-                        
-                        sell_amount = min(remaining_to_sell, available_to_sell)
-                        cost_basis = sell_amount * (buy_tx.price_usd_in or Decimal("0"))
-                        proceeds = sell_amount * (sell_tx.price_usd_out or Decimal("0"))
-                        gain_loss = proceeds - cost_basis
-                        
-                        total_gain_loss += gain_loss
-                        total_cost_basis += cost_basis
-                        total_proceeds += proceeds
-                        
-                        # Create tax record
-                        tax_record = TaxRecordModel(
-                            wallet_id=wallet_id,
-                            transaction_id=sell_tx.id,
-                            gain_loss=gain_loss,
-                            cost_basis=cost_basis,
-                            proceeds=proceeds,
-                            tax_method="LIFO",
-                            year=year
-                        )
-                        session.add(tax_record)
-                        
-                        remaining_to_sell -= sell_amount
-                        remaining_buy_amount += sell_amount
+                    # Create tax record
+                    tax_record = TaxRecordModel(
+                        wallet_id=wallet_id,
+                        transaction_id=sell_tx.id,
+                        gain_loss=gain_loss,
+                        cost_basis=cost_basis,
+                        proceeds=proceeds,
+                        tax_method="LIFO",
+                        year=year
+                    )
+                    session.add(tax_record)
                 
                 session.flush()
                 
@@ -231,7 +284,7 @@ class TaxCalculator:
                     "total_gain_loss": str(total_gain_loss),
                     "total_cost_basis": str(total_cost_basis),
                     "total_proceeds": str(total_proceeds),
-                    "estimated_tax_usd": str(total_gain_loss * Decimal("0.21"))
+                    "estimated_tax_usd": str(estimate_tax(total_gain_loss))
                 }
         except Exception as e:
             logger.error(f"❌ Error calculating LIFO: {str(e)}")
@@ -255,7 +308,7 @@ class TaxCalculator:
                 buy_query = session.query(TransactionModel).filter(
                     TransactionModel.wallet_id == wallet_id,
                     TransactionModel.tx_type.in_(["buy", "transfer_in"]),
-                    TransactionModel.created_at.year == year
+                    extract("year", TransactionModel.created_at) == year
                 )
                 
                 if token:
@@ -266,7 +319,7 @@ class TaxCalculator:
                 sell_query = session.query(TransactionModel).filter(
                     TransactionModel.wallet_id == wallet_id,
                     TransactionModel.tx_type.in_(["sell", "swap", "transfer_out"]),
-                    TransactionModel.created_at.year == year
+                    extract("year", TransactionModel.created_at) == year
                 )
                 
                 if token:
@@ -281,8 +334,8 @@ class TaxCalculator:
                 total_cost = Decimal("0")
                 
                 for buy_tx in buy_transactions:
-                    amount = buy_tx.amount_out or Decimal("0")
-                    price = buy_tx.price_usd_in or Decimal("0")
+                    amount = buy_tx.amount_out or _ZERO
+                    price = buy_tx.price_usd_in or _ZERO
                     total_bought += amount
                     total_cost += amount * price
                 
@@ -294,8 +347,8 @@ class TaxCalculator:
                 total_proceeds = Decimal("0")
                 
                 for sell_tx in sell_transactions:
-                    amount = sell_tx.amount_in or Decimal("0")
-                    price = sell_tx.price_usd_out or Decimal("0")
+                    amount = sell_tx.amount_in or _ZERO
+                    price = sell_tx.price_usd_out or _ZERO
                     
                     cost_basis = amount * average_cost_per_unit
                     proceeds = amount * price
@@ -328,7 +381,7 @@ class TaxCalculator:
                     "total_gain_loss": str(total_gain_loss),
                     "total_cost_basis": str(total_cost_basis),
                     "total_proceeds": str(total_proceeds),
-                    "estimated_tax_usd": str(total_gain_loss * Decimal("0.21"))
+                    "estimated_tax_usd": str(estimate_tax(total_gain_loss))
                 }
         except Exception as e:
             logger.error(f"❌ Error calculating average cost: {str(e)}")
@@ -347,31 +400,20 @@ class TaxCalculator:
         """
         try:
             with self.db_manager.session_context() as session:
-                # Get all tax records for the year
-                tax_records = session.query(TaxRecordModel).filter(
+                # Aggregate the year's tax records per method in SQL
+                rows = session.query(
+                    TaxRecordModel.tax_method,
+                    exact_sum(session, TaxRecordModel.gain_loss).label("total_gain_loss"),
+                    exact_sum(session, TaxRecordModel.cost_basis).label("total_cost_basis"),
+                    exact_sum(session, TaxRecordModel.proceeds).label("total_proceeds"),
+                    func.count(TaxRecordModel.id).label("records_count"),
+                ).filter(
                     TaxRecordModel.wallet_id == wallet_id,
                     TaxRecordModel.year == year
-                ).all()
+                ).group_by(TaxRecordModel.tax_method).all()
                 
-                # Group by method
-                by_method = {}
-                total_gain_loss = Decimal("0")
-                
-                for record in tax_records:
-                    method = record.tax_method
-                    if method not in by_method:
-                        by_method[method] = {
-                            "total_gain_loss": Decimal("0"),
-                            "total_cost_basis": Decimal("0"),
-                            "total_proceeds": Decimal("0"),
-                            "records_count": 0
-                        }
-                    
-                    by_method[method]["total_gain_loss"] += record.gain_loss
-                    by_method[method]["total_cost_basis"] += record.cost_basis
-                    by_method[method]["total_proceeds"] += record.proceeds
-                    by_method[method]["records_count"] += 1
-                    total_gain_loss += record.gain_loss
+                by_method = {row.tax_method: row for row in rows}
+                total_gain_loss = sum((row.total_gain_loss for row in rows), Decimal("0"))
                 
                 return {
                     "wallet_id": wallet_id,
@@ -379,14 +421,14 @@ class TaxCalculator:
                     "total_gain_loss": str(total_gain_loss),
                     "by_method": {
                         method: {
-                            "total_gain_loss": str(data["total_gain_loss"]),
-                            "total_cost_basis": str(data["total_cost_basis"]),
-                            "total_proceeds": str(data["total_proceeds"]),
-                            "records_count": data["records_count"]
+                            "total_gain_loss": str(data.total_gain_loss),
+                            "total_cost_basis": str(data.total_cost_basis),
+                            "total_proceeds": str(data.total_proceeds),
+                            "records_count": data.records_count
                         }
                         for method, data in by_method.items()
                     },
-                    "estimated_tax_usd": str(total_gain_loss * Decimal("0.21")),
+                    "estimated_tax_usd": str(estimate_tax(total_gain_loss)),
                     "generated_at": now_utc().isoformat()
                 }
         except Exception as e:
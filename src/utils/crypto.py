@@ -4,15 +4,25 @@ Simple encryption helpers using Fernet.
 We derive a 32-byte base64 key from the configured `security.secret_key` so
 projects don't need to store a second key. This is convenient for development
 but for production you may want to use a dedicated encryption key.
+
+The key is derived (and the config read) once per process and the resulting
+Fernet instance is shared by every call.
 """
-from typing import Optional
+from typing import Iterable, List, Optional
+import functools
 import hashlib
 import base64
 from cryptography.fernet import Fernet
 from src.utils.config_loader import ConfigLoader
 
 
+@functools.lru_cache(maxsize=1)
 def _get_fernet() -> Fernet:
+    """Return the Fernet instance for the configured secret key.
+
+    Cached for the process lifetime; call `_get_fernet.cache_clear()` after
+    changing `security.secret_key`.
+    """
     cfg = ConfigLoader()
     sec = cfg.get_security_config()
     raw = sec.get("secret_key") or ""
@@ -22,6 +32,13 @@ def _get_fernet() -> Fernet:
     return Fernet(b64)
 
 
+def _decrypt(f: Fernet, token: str) -> Optional[str]:
+    try:
+        return f.decrypt(token.encode("utf-8")).decode("utf-8")
+    except Exception:
+        return None
+
+
 def encrypt_value(plaintext: str) -> str:
     f = _get_fernet()
     token = f.encrypt(plaintext.encode("utf-8"))
@@ -29,12 +46,19 @@ def encrypt_value(plaintext: str) -> str:
 
 
 def decrypt_value(token: str) -> Optional[str]:
+    return _decrypt(_get_fernet(), token)
+
+
+def encrypt_many(values: Iterable[str]) -> List[str]:
+    """Encrypt several values with the shared Fernet instance."""
     f = _get_fernet()
-    try:
-        val = f.decrypt(token.encode("utf-8"))
-        return val.decode("utf-8")
-    except Exception:
-        return None
+    return [f.encrypt(v.encode("utf-8")).decode("utf-8") for v in values]
+
+
+def decrypt_many(tokens: Iterable[str]) -> List[Optional[str]]:
+    """Decrypt several tokens with the shared Fernet instance; invalid tokens yield None."""
+    f = _get_fernet()
+    return [_decrypt(f, token) for token in tokens]
 
 
-__all__ = ["encrypt_value", "decrypt_value"]
+__all__ = ["encrypt_value", "decrypt_value", "encrypt_many", "decrypt_many"]
@@ -0,0 +1,137 @@
+"""Shared helpers for the ccxt-backed integration tests."""
+import asyncio
+import os
+from collections import ChainMap
+
+try:
+    import ccxt.async_support as ccxt_async
+except Exception:  # pragma: no cover - the ccxt tests skip without ccxt
+    ccxt_async = None
+
+
+def normalize_ccxt_balance(bal) -> dict:
+    """Convert a ccxt `fetch_balance()` result into ExchangeService's balances format.
+
+    Returns {'BTC': {'free': '0.1', 'locked': '0', 'total': '0.1'}, ...};
+    currencies whose free, used and total amounts are all empty or zero are
+    dropped (exchanges like Binance list hundreds of those).
+    """
+    if not isinstance(bal, dict):
+        return {}
+    # ccxt keeps per-currency amounts under 'free', 'used' and 'total'
+    free_map, used_map, total_map = (
+        part if isinstance(part, dict) else {} for part in (bal.get('free'), bal.get('used'), bal.get('total'))
+    )
+
+    return {
+        c: {
+            "free": _amount_str(free_map.get(c)),
+            "locked": _amount_str(used_map.get(c)),
+            "total": _amount_str(_total(free_map.get(c), used_map.get(c), total_map.get(c))),
+        }
+        for c in ChainMap(total_map, used_map, free_map)
+        if free_map.get(c) or used_map.get(c) or total_map.get(c)
+    }
+
+
+def _amount_str(value) -> str:
+    return str(value) if value is not None else "0"
+
+
+def _total(free, used, total):
+    """`total` if reported, else free + used, else free (or None)."""
+    if total is not None:
+        return total
+    if free is not None and used is not None:
+        try:
+            return float(free) + float(used)
+        except (TypeError, ValueError):
+            pass
+    return free
+
+
+def pick_trades_symbol(exchange, preferred: str = "BTC/USDT"):
+    """Return a market symbol likely to have user trades.
+
+    `BINANCE_TEST_SYMBOL` (env) overrides `preferred`. The choice is checked
+    against the exchange's loaded markets, falling back to the first market;
+    None when no markets are loaded.
+    """
+    markets = getattr(exchange, "markets", None) or {}
+    wanted = os.getenv("BINANCE_TEST_SYMBOL") or preferred
+    if not markets:
+        return None
+    if wanted in markets:
+        return wanted
+    return next(iter(markets))
+
+
+def fetch_account_snapshot(exchange, symbol=None, runner=None):
+    """Fetch balance, deposits, withdrawals and trades for `exchange` concurrently.
+
+    `exchange` is a (sync) ccxt client such as the session fixtures in
+    conftest.py. Its credentials and already-loaded markets are reused by a
+    `ccxt.async_support` twin so the four read-only calls run under one
+    `asyncio.gather` and cost max(RTT) instead of their sum.
+
+    Pass the `asyncio_runner` fixture as `runner` to reuse the session
+    event loop; without it a throwaway loop is created via `asyncio.run`.
+
+    Returns a dict with the keys 'balance', 'deposits', 'withdrawals' and
+    'trades'; a call that failed maps to the exception it raised.
+    """
+    if ccxt_async is None:
+        return _fetch_sequential(exchange, symbol)
+    run = runner.run if runner is not None else asyncio.run
+    return run(_fetch_concurrent(exchange, symbol))
+
+
+def _trades_args(symbol):
+    return (symbol,) if symbol else ()
+
+
+def _fetch_sequential(exchange, symbol):
+    calls = {
+        "balance": lambda: exchange.fetch_balance(),
+        "deposits": lambda: exchange.fetch_deposits(),
+        "withdrawals": lambda: exchange.fetch_withdrawals(),
+        "trades": lambda: exchange.fetch_my_trades(*_trades_args(symbol)),
+    }
+    out = {}
+    for name, call in calls.items():
+        try:
+            out[name] = call()
+        except Exception as e:
+            out[name] = e
+    return out
+
+
+def async_twin(exchange):
+    """Build a `ccxt.async_support` client sharing `exchange`'s credentials and loaded markets.
+
+    Must be called with a running event loop; the caller closes it with
+    `await client.close()`.
+    """
+    config = {"apiKey": exchange.apiKey, "secret": exchange.secret, "enableRateLimit": True}
+    if getattr(exchange, "password", None):
+        config["password"] = exchange.password
+    client = getattr(ccxt_async, exchange.id)(config)
+    if getattr(exchange, "markets", None):
+        client.set_markets(exchange.markets, getattr(exchange, "currencies", None))
+    return client
+
+
+async def _fetch_concurrent(exchange, symbol):
+    client = async_twin(exchange)
+    try:
+        names = ("balance", "deposits", "withdrawals", "trades")
+        results = await asyncio.gather(
+            client.fetch_balance(),
+            client.fetch_deposits(),
+            client.fetch_withdrawals(),
+            client.fetch_my_trades(*_trades_args(symbol)),
+            return_exceptions=True,
+        )
+        return dict(zip(names, results))
+    finally:
+        await client.close()
@@ -1,4 +1,5 @@
 import os
+import re
 import json
 from dotenv import load_dotenv
 
@@ -25,12 +26,17 @@ SENSITIVE_KEYS = {
     "info",
 }
 
+# Precomputed once so `sanitize` does a set probe plus a single regex scan
+# per key instead of a Python-level substring loop.
+_SENSITIVE_KEYS_LOWER = {k.lower() for k in SENSITIVE_KEYS}
+_SENSITIVE_RE = re.compile(r"key|secret|token|passwd", re.I)
+
 
 def mask_value(v):
-    if v is None:
-        return None
-    if isinstance(v, (int, float, bool)):
+    if v is None or isinstance(v, (int, float, bool)):
         return v
+    if isinstance(v, str):
+        return v[:6] + '...' + v[-6:] if len(v) > 64 else v
     s = str(v)
     if len(s) > 64:
         return s[:6] + '...' + s[-6:]
@@ -42,7 +48,7 @@ def sanitize(obj):
         out = {}
         for k, v in obj.items():
             lk = k.lower()
-            if k in SENSITIVE_KEYS or any(sub in lk for sub in ("key", "secret", "token", "passwd")):
+            if lk in _SENSITIVE_KEYS_LOWER or _SENSITIVE_RE.search(lk):
                 out[k] = "***MASKED***"
             elif k == "info" and isinstance(v, dict):
                 # show keys but mask values
@@ -51,6 +57,9 @@ def sanitize(obj):
                 out[k] = sanitize(v)
         return out
     elif isinstance(obj, list):
+        # lists of ids/timestamps can't hold sensitive keys; return them as-is
+        if all(isinstance(i, (int, float, bool, type(None))) for i in obj):
+            return obj
         return [sanitize(i) for i in obj]
     else:
         # primitive
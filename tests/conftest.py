@@ -1,7 +1,33 @@
+import asyncio
+import copy
+import functools
+import os
+import uuid
+
 import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import Session, sessionmaker
+
+try:
+    import ccxt
+except Exception:  # pragma: no cover - exchange fixtures skip without ccxt
+    ccxt = None
+
+from dotenv import load_dotenv
+
+# Cheap password hashing for the whole run; read by src.auth.security at import.
+os.environ.setdefault("TESTING", "1")
+
+# Read the repo-root .env once per session so credential-gated tests see it.
+load_dotenv()
 
-from src.database.manager import get_db_manager
+from src.auth.models import UserModel
+from src.database import manager as db_manager_mod
+from src.database.manager import DatabaseManager, get_db_manager, init_database
 from src.database.models import Base
+from src.utils.crypto import encrypt_many
+
+from db_helpers import create_exchange_account
 
 
 @pytest.fixture(autouse=False)
@@ -29,3 +55,250 @@ def fresh_db():
         Base.metadata.drop_all(dbm.engine)
     except Exception:
         pass
+
+
+@pytest.fixture(scope="session")
+def dbm():
+    """In-memory database manager with the schema created and price mappings seeded once per session.
+
+    It is installed as the global manager so code that calls
+    `get_db_manager()` (e.g. a bare `ExchangeService()`) shares it. The
+    in-memory URL gets a StaticPool, so every `session_context()` reuses one
+    connection instead of reopening the file DB and re-running its PRAGMAs.
+    Each pytest-xdist worker is its own process and so gets its own database.
+    """
+    previous = db_manager_mod._db_manager
+    mgr = DatabaseManager("sqlite:///:memory:")
+    db_manager_mod._db_manager = mgr
+    init_database()
+    yield mgr
+    db_manager_mod._db_manager = previous
+    mgr.close()
+
+
+@pytest.fixture(scope="session")
+def _savepoint_dbm():
+    """Private in-memory manager whose schema is created once for `db_session`/`isolated_dbm`."""
+    mgr = DatabaseManager("sqlite:///:memory:")
+
+    # pysqlite defers BEGIN until the first DML statement, so the outer
+    # transaction would not exist and RELEASE SAVEPOINT would commit for
+    # real. Take over transaction control so SAVEPOINTs nest properly.
+    @event.listens_for(mgr.engine, "connect")
+    def _no_pysqlite_begin(dbapi_conn, connection_record):
+        dbapi_conn.isolation_level = None
+
+    @event.listens_for(mgr.engine, "begin")
+    def _emit_begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+    mgr.create_tables(Base)
+    yield mgr
+    mgr.close()
+
+
+@pytest.fixture
+def _savepoint_connection(_savepoint_dbm):
+    conn = _savepoint_dbm.engine.connect()
+    transaction = conn.begin()
+    yield conn
+    transaction.rollback()
+    conn.close()
+
+
+@pytest.fixture
+def db_session(_savepoint_connection):
+    """ORM session wrapped in a transaction that is rolled back after the test.
+
+    The schema is created once per session; `session.commit()` inside the
+    test only releases a SAVEPOINT, so no test pays for DDL or sees another
+    test's rows.
+    """
+    session = Session(bind=_savepoint_connection, join_transaction_mode="create_savepoint")
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def isolated_dbm(_savepoint_dbm, _savepoint_connection):
+    """DatabaseManager whose `session_context()` sessions share the rolled-back test transaction.
+
+    Pass it to services (e.g. `ExchangeService(db_manager=isolated_dbm)`)
+    that open their own sessions.
+    """
+    mgr = copy.copy(_savepoint_dbm)
+    mgr.SessionLocal = sessionmaker(
+        bind=_savepoint_connection,
+        join_transaction_mode="create_savepoint",
+        expire_on_commit=False,
+    )
+    return mgr
+
+
+@pytest.fixture(scope="session")
+def client():
+    """One TestClient over the FastAPI app, shared by every API test in the session.
+
+    Importing `main` wires every router and middleware; doing it once keeps
+    that cost out of the individual tests. Startup hooks are not run (the
+    client is not used as a context manager), so no background sync starts.
+    """
+    from fastapi.testclient import TestClient
+    from main import app
+
+    return TestClient(app, base_url="http://localhost")
+
+
+@pytest.fixture(scope="session")
+def asyncio_runner():
+    """One `asyncio.Runner` (and event loop) shared by every async test in the session.
+
+    Tests drive coroutines with `asyncio_runner.run(coro)` instead of
+    `asyncio.run(coro)`, which builds and tears down a new loop each call.
+    """
+    with asyncio.Runner() as runner:
+        yield runner
+
+
+@functools.lru_cache(maxsize=32)
+def _encrypted_credentials(api_key: str, api_secret: str) -> tuple:
+    # Fernet tokens carry a random IV but any token decrypts to the same
+    # value, so accounts created with the same credentials can share them.
+    return tuple(encrypt_many([api_key, api_secret]))
+
+
+@pytest.fixture
+def make_exchange_account(dbm):
+    """Factory that creates a fresh user and ExchangeAccount in one transaction.
+
+    Usage: `acct_id = make_exchange_account("binance", api_key, api_secret)`.
+    """
+    def _make(exchange: str, api_key: str, api_secret: str, label: str = None) -> int:
+        unique = uuid.uuid4().hex[:8]
+        api_key_encrypted, api_secret_encrypted = _encrypted_credentials(api_key, api_secret)
+        with dbm.session_context() as session:
+            user = UserModel(email=f"{exchange}-{unique}@example.com", username=f"{exchange}test-{unique}", hashed_password="x")
+            session.add(user)
+            session.flush()
+            acct = create_exchange_account(
+                session,
+                user_id=user.id,
+                exchange=exchange,
+                api_key_encrypted=api_key_encrypted,
+                api_secret_encrypted=api_secret_encrypted,
+                label=label or f"pytest-{exchange}",
+            )
+            return acct.id
+
+    return _make
+
+
+def _make_exchange(exchange_id: str, key_env: str, secret_env: str, password_env: str = None):
+    """Build a ccxt client from env credentials and load its markets, or skip."""
+    if ccxt is None:
+        pytest.skip("ccxt not installed")
+
+    api_key = os.getenv(key_env)
+    api_secret = os.getenv(secret_env)
+    if not api_key or not api_secret:
+        pytest.skip(f"{key_env}/{secret_env} not set in environment or .env")
+
+    config = {"apiKey": api_key, "secret": api_secret, "enableRateLimit": True}
+    if password_env:
+        config["password"] = os.getenv(password_env)
+    try:
+        exchange = getattr(ccxt, exchange_id)(config)
+    except Exception:
+        pytest.skip(f"ccxt {exchange_id} unavailable")
+
+    try:
+        exchange.load_markets()
+    except Exception as e:
+        pytest.skip(f"Unable to load markets from {exchange_id}: {e}")
+    return exchange
+
+
+def _close_exchange(exchange):
+    close = getattr(exchange, "close", None)
+    if callable(close):
+        try:
+            close()
+        except Exception:
+            pass
+
+
+@pytest.fixture(scope="session")
+def binance_exchange():
+    """Session-wide ccxt Binance client.
+
+    Markets are loaded once and the client's keep-alive HTTP pool is shared by
+    every test that requests it. Skips when ccxt or credentials are missing.
+    """
+    exchange = _make_exchange("binance", "BINANCE_API_KEY", "BINANCE_API_SECRET")
+    yield exchange
+    _close_exchange(exchange)
+
+
+@pytest.fixture(scope="session")
+def coinbase_exchange():
+    """Session-wide ccxt Coinbase Pro client (see `binance_exchange`)."""
+    exchange = _make_exchange("coinbasepro", "COINBASE_API_KEY", "COINBASE_API_SECRET", "COINBASE_API_PASSPHRASE")
+    yield exchange
+    _close_exchange(exchange)
+
+
+@pytest.fixture(scope="session")
+def kraken_exchange():
+    """Session-wide ccxt Kraken client (see `binance_exchange`)."""
+    exchange = _make_exchange("kraken", "KRAKEN_API_KEY", "KRAKEN_API_SECRET")
+    yield exchange
+    _close_exchange(exchange)
+
+
+@pytest.fixture(scope="session")
+def connector_manager():
+    """Session-wide ConnectorManager with the real Binance, Coinbase and Kraken connectors registered.
+
+    Connectors (and their HTTP sessions / auth state) are built once and
+    reused by every test that requests the fixture. Skips when any
+    credentials are missing; fails if a connector cannot be initialized.
+    """
+    from src.api.connectors.manager import ConnectorManager
+
+    manager = ConnectorManager()
+
+    # Binance
+    bin_key = os.getenv('BINANCE_API_KEY')
+    bin_secret = os.getenv('BINANCE_API_SECRET')
+    if not bin_key or not bin_secret:
+        pytest.skip("BINANCE_API_KEY and BINANCE_API_SECRET not set; skipping integration against real Binance connector")
+    try:
+        from src.api.connectors.exchanges.binance_connector import BinanceConnector
+        manager.register_exchange('binance', BinanceConnector(bin_key, bin_secret))
+    except Exception as e:
+        pytest.fail(f"Could not initialize BinanceConnector: {e}")
+
+    # Coinbase
+    cb_key = os.getenv('COINBASE_API_KEY')
+    cb_secret = os.getenv('COINBASE_API_SECRET')
+    cb_pass = os.getenv('COINBASE_API_PASSPHRASE') or os.getenv('COINBASE_API_PASSPHRASE_ENV')
+    if not cb_key or not cb_secret or not cb_pass:
+        pytest.skip("COINBASE API credentials not set; skipping integration against real Coinbase connector")
+    try:
+        from src.api.connectors.exchanges.coinbase_connector import CoinbaseConnector
+        manager.register_exchange('coinbase', CoinbaseConnector(cb_key, cb_secret, cb_pass))
+    except Exception as e:
+        pytest.fail(f"Could not initialize CoinbaseConnector: {e}")
+
+    # Kraken
+    kr_key = os.getenv('KRAKEN_API_KEY')
+    kr_secret = os.getenv('KRAKEN_API_SECRET')
+    if not kr_key or not kr_secret:
+        pytest.skip("KRAKEN_API_KEY and KRAKEN_API_SECRET not set; skipping integration against real Kraken connector")
+    try:
+        from src.api.connectors.exchanges.kraken_connector import KrakenConnector
+        manager.register_exchange('kraken', KrakenConnector(kr_key, kr_secret))
+    except Exception as e:
+        pytest.fail(f"Could not initialize KrakenConnector: {e}")
+
+    return manager
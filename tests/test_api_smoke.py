@@ -0,0 +1,34 @@
+"""Integration smoke test for auth + exchanges endpoints."""
+
+
+def test_auth_and_exchanges_smoke(client, dbm, monkeypatch):
+    # Single-user mode: login is checked against the ADMIN_* env variables,
+    # read per request, so they only need to be set for this test.
+    monkeypatch.setenv('ADMIN_EMAIL', 'test+admin@example.com')
+    monkeypatch.setenv('ADMIN_USERNAME', 'testadmin')
+    # For tests we can use a plain password (or set ADMIN_PASSWORD_HASH instead)
+    monkeypatch.setenv('ADMIN_PASSWORD', 'Testpass123!')
+    monkeypatch.delenv('ADMIN_PASSWORD_HASH', raising=False)
+
+    r = client.post('/api/v1/auth/login', json={'email': 'test+admin@example.com', 'password': 'Testpass123!'})
+    assert r.status_code == 200, r.text
+    headers = {'Authorization': f"Bearer {r.json()['access_token']}"}
+
+    # Create exchange account
+    r = client.post('/api/v1/exchanges', json={
+        'name': 'binance',
+        'api_key': 'sk_test_1234567890abcdef',
+        'api_secret': 'ss_test_abcdef1234567890',
+        'label': 'My Test Binance'
+    }, headers=headers)
+    assert r.status_code == 201, r.text
+    acc_id = r.json().get('id')
+
+    # List exchanges
+    r = client.get('/api/v1/exchanges', headers=headers)
+    assert r.status_code == 200, r.text
+    assert acc_id in {e['id'] for e in r.json()['exchanges']}
+
+    # Delete exchange
+    r = client.delete(f'/api/v1/exchanges/{acc_id}', headers=headers)
+    assert r.status_code == 204, r.text
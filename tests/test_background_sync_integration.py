@@ -1,18 +1,13 @@
 import asyncio
-import os
-import pytest
-from src.database.manager import init_database, get_db_manager
-try:
-    from dotenv import load_dotenv
-    # load .env from repo root so test can pick up credentials
-    load_dotenv()
-except Exception:
-    # If python-dotenv is not installed, continue — test will read environment directly
-    pass
-from src.api.connectors.manager import ConnectorManager
-from src.database.models import ExchangeAccount, BlockchainWallet
+import uuid
+from sqlalchemy import exists
+from src.database.models import (
+    ExchangeAccount, BlockchainWallet, WalletBalance,
+    ExchangeBalance, ExchangeTrade, ExchangeDeposit, ExchangeWithdrawal,
+)
+from src.services.exchange_service import ExchangeService
 from src.auth.models import UserModel
-from src.utils.crypto import encrypt_value
+from src.utils.crypto import encrypt_many
 from decimal import Decimal
 from datetime import datetime
 
@@ -28,8 +23,8 @@ class FakeExchangeConnector:
             "USDC": {"free": "1000", "locked": "0", "total": "1000", "contractAddress": "0xA0b86991c6218b36c1d19d4a2e9eb0ce3606eb48", "network": "ethereum"}
         }
         if persist_account_id:
-            # allow ExchangeService to persist
-            await asyncio.get_event_loop().run_in_executor(None, lambda: None)
+            # yield to the loop as a real connector would while persisting
+            await asyncio.sleep(0)
         return balances
 
     async def get_deposit_history(self, persist_account_id=None, limit=100):
@@ -64,30 +59,26 @@ class FakePhantomConnector:
         return {"address": self.address}
 
 
-def test_background_sync_integration(tmp_path):
+def test_background_sync_integration(tmp_path, dbm, connector_manager, asyncio_runner):
     """Integration-style test: initialize DB, register fake connectors and persist data as background sync would.
 
-    This test wraps the async flow with `asyncio.run()` so it can run without pytest-asyncio.
+    This test drives the async flow on the session `asyncio_runner` so it can run without pytest-asyncio.
     """
 
     async def _main():
-        # Initialize DB (creates tables and seeds price_mappings)
-        init_database()
-
-        dbm = get_db_manager()
-
         # Create a user and exchange accounts + wallets
         with dbm.session_context() as session:
-            import uuid
             unique_email = f"test+{uuid.uuid4().hex}@example.com"
             user = UserModel(email=unique_email, username=f"testuser_{uuid.uuid4().hex[:6]}", hashed_password="x")
             session.add(user)
             session.flush()
+            user_id = user.id
 
             # Create exchange accounts for binance, coinbase, kraken
             accounts = []
+            key_enc, secret_enc = encrypt_many(["k", "s"])
             for exch in ("binance", "coinbase", "kraken"):
-                acct = ExchangeAccount(user_id=user.id, exchange=exch, api_key_encrypted=encrypt_value("k"), api_secret_encrypted=encrypt_value("s"), is_active=True)
+                acct = ExchangeAccount(user_id=user.id, exchange=exch, api_key_encrypted=key_enc, api_secret_encrypted=secret_enc, is_active=True)
                 session.add(acct)
                 session.flush()
                 accounts.append(acct)
@@ -97,109 +88,82 @@ def test_background_sync_integration(tmp_path):
             session.add(w)
             session.flush()
 
-        # Always attempt to instantiate real connectors. Fail early if credentials missing.
-        manager = ConnectorManager()
-
-        # Binance
-        bin_key = os.getenv('BINANCE_API_KEY')
-        bin_secret = os.getenv('BINANCE_API_SECRET')
-        if not bin_key or not bin_secret:
-            pytest.skip("BINANCE_API_KEY and BINANCE_API_SECRET not set; skipping integration against real Binance connector")
-        try:
-            from src.api.connectors.exchanges.binance_connector import BinanceConnector
-            manager.register_exchange('binance', BinanceConnector(bin_key, bin_secret))
-        except Exception as e:
-            pytest.fail(f"Could not initialize BinanceConnector: {e}")
-
-        # Coinbase
-        cb_key = os.getenv('COINBASE_API_KEY')
-        cb_secret = os.getenv('COINBASE_API_SECRET')
-        cb_pass = os.getenv('COINBASE_API_PASSPHRASE') or os.getenv('COINBASE_API_PASSPHRASE_ENV')
-        if not cb_key or not cb_secret or not cb_pass:
-            pytest.skip("COINBASE API credentials not set; skipping integration against real Coinbase connector")
-        try:
-            from src.api.connectors.exchanges.coinbase_connector import CoinbaseConnector
-            manager.register_exchange('coinbase', CoinbaseConnector(cb_key, cb_secret, cb_pass))
-        except Exception as e:
-            pytest.fail(f"Could not initialize CoinbaseConnector: {e}")
-
-        # Kraken
-        kr_key = os.getenv('KRAKEN_API_KEY')
-        kr_secret = os.getenv('KRAKEN_API_SECRET')
-        if not kr_key or not kr_secret:
-            pytest.skip("KRAKEN_API_KEY and KRAKEN_API_SECRET not set; skipping integration against real Kraken connector")
-        try:
-            from src.api.connectors.exchanges.kraken_connector import KrakenConnector
-            manager.register_exchange('kraken', KrakenConnector(kr_key, kr_secret))
-        except Exception as e:
-            pytest.fail(f"Could not initialize KrakenConnector: {e}")
-
-        # For each exchange account in DB, find the registered connector and call persistence methods
+        manager = connector_manager
+
+        # For each of this test's exchange accounts, find the registered connector and call persistence methods
         with dbm.session_context() as session:
-            accts = session.query(ExchangeAccount).filter_by(is_active=True).all()
+            accts = session.query(ExchangeAccount).filter_by(user_id=user_id, is_active=True).all()
+
+        # Run exchange syncs: each account fetches its four histories
+        # concurrently, and all accounts are synced concurrently.
+        es = ExchangeService()
+        # the in-memory test DB is a single shared connection: one writer at a time
+        db_lock = asyncio.Lock()
 
-        # Run exchange syncs
-        for acct in accts:
+        def _ok(data):
+            return None if isinstance(data, BaseException) else data
+
+        # account id -> {model: fetched items}, to check what each persist wrote
+        fetched = {}
+
+        async def _sync_account(acct):
             conn = manager.get_connector('exchange', acct.exchange)
             if not conn:
-                continue
-            # call methods and then explicitly persist via ExchangeService for our fakes
-            from src.services.exchange_service import ExchangeService
-            es = ExchangeService()
-
-            balances = await conn.get_balance(persist_account_id=acct.id)
-            try:
-                es.persist_balances(acct.id, balances)
-            except Exception:
-                pass
-
-            deposits = await conn.get_deposit_history(persist_account_id=acct.id)
-            try:
-                es.persist_deposits(acct.id, deposits)
-            except Exception:
-                pass
-
-            withdrawals = await conn.get_withdraw_history(persist_account_id=acct.id)
-            try:
-                es.persist_withdrawals(acct.id, withdrawals)
-            except Exception:
-                pass
-
-            trades = await conn.get_trades(persist_account_id=acct.id)
-            try:
-                es.persist_trades(acct.id, trades)
-            except Exception:
-                pass
+                return None
+            balances, deposits, withdrawals, trades = await asyncio.gather(
+                conn.get_balance(persist_account_id=acct.id),
+                conn.get_deposit_history(persist_account_id=acct.id),
+                conn.get_withdraw_history(persist_account_id=acct.id),
+                conn.get_trades(persist_account_id=acct.id),
+                return_exceptions=True,
+            )
+            fetched[acct.id] = {
+                ExchangeBalance: _ok(balances), ExchangeDeposit: _ok(deposits),
+                ExchangeWithdrawal: _ok(withdrawals), ExchangeTrade: _ok(trades),
+            }
+            # explicitly persist via ExchangeService for our fakes, in one
+            # transaction; blocking SQLAlchemy work runs off the event loop.
+            # Only fetch failures are tolerated (above); a persist error fails the test.
+            async with db_lock:
+                await asyncio.to_thread(
+                    es.persist_all, acct.id,
+                    balances=_ok(balances), deposits=_ok(deposits),
+                    withdrawals=_ok(withdrawals), trades=_ok(trades),
+                )
+            return acct.id
+
+        # each account returns its id only once persist_all has completed
+        synced = await asyncio.gather(*[_sync_account(acct) for acct in accts])
+        assert None not in synced and set(synced) == {acct.id for acct in accts}, "persist_all did not run for every account"
 
         # Run wallet sync: instantiate fake phantom connector and persist a wallet balance
         with dbm.session_context() as session:
-            wallets = session.query(BlockchainWallet).filter_by(is_active=True).all()
-
-        for w in wallets:
-            if w.wallet_type == 'phantom' and w.network == 'solana':
-                conn = FakePhantomConnector(w.address, network=w.network)
-                resp = await conn.get_solana_balance()
-                # Persist a WalletBalance snapshot directly
-                from src.database.models import WalletBalance
-                with dbm.session_context() as session:
+            wallets = session.query(BlockchainWallet).filter_by(user_id=user_id, is_active=True).all()
+
+        # Persist all WalletBalance snapshots in one transaction
+        with dbm.session_context() as session:
+            for w in wallets:
+                if w.wallet_type == 'phantom' and w.network == 'solana':
+                    conn = FakePhantomConnector(w.address, network=w.network)
+                    resp = await conn.get_solana_balance()
                     wb = WalletBalance(wallet_id=w.id, token='SOL', balance=str(resp.get('balance')), balance_usd=None, balance_fiat=None, timestamp=datetime.utcnow())
                     session.add(wb)
 
-        # Finally, assert that the DB contains persisted rows
+        # Finally, assert that each of this test's accounts has rows for every kind it fetched
         with dbm.session_context() as session:
-            # exchange balances
-            from src.database.models import ExchangeBalance, ExchangeTrade, ExchangeDeposit, ExchangeWithdrawal, WalletBalance
-
-            eb_count = session.query(ExchangeBalance).count()
-            et_count = session.query(ExchangeTrade).count()
-            dep_count = session.query(ExchangeDeposit).count()
-            wd_count = session.query(ExchangeWithdrawal).count()
-            wb_count = session.query(WalletBalance).count()
-
-            assert eb_count > 0, "Expected at least one ExchangeBalance persisted"
-            assert et_count > 0, "Expected at least one ExchangeTrade persisted"
-            assert dep_count > 0, "Expected at least one ExchangeDeposit persisted"
-            assert wd_count > 0, "Expected at least one ExchangeWithdrawal persisted"
-            assert wb_count > 0, "Expected at least one WalletBalance persisted"
-
-    asyncio.run(_main())
+            # existence probes stop at the first row instead of counting the table
+            assert len(fetched) == 3, "Expected all three exchange accounts to sync"
+            for acct_id, kinds in fetched.items():
+                # every account reports balances; the histories may legitimately be empty
+                assert session.query(exists().where(ExchangeBalance.exchange_account_id == acct_id)).scalar(), \
+                    f"Expected an ExchangeBalance for account {acct_id}"
+                for model, items in kinds.items():
+                    if model is ExchangeBalance or not items:
+                        continue
+                    assert session.query(exists().where(model.exchange_account_id == acct_id)).scalar(), \
+                        f"Expected a {model.__name__} for account {acct_id}"
+            for w in wallets:
+                assert session.query(exists().where(WalletBalance.wallet_id == w.id)).scalar(), \
+                    f"Expected a WalletBalance for wallet {w.id}"
+
+    asyncio_runner.run(_main())
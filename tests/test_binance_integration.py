@@ -1,4 +1,3 @@
-import os
 import pytest
 
 try:
@@ -6,11 +5,11 @@ try:
 except Exception:  # pragma: no cover - if ccxt not installed the test will be skipped
     ccxt = None
 
-from dotenv import load_dotenv
+from _ccxt_utils import pick_trades_symbol
 
 
 @pytest.mark.integration
-def test_binance_read_only_endpoints():
+def test_binance_read_only_endpoints(binance_exchange):
     """Integration test for Binance read-only endpoints using CCXT.
 
     This test requires `BINANCE_API_KEY` and `BINANCE_API_SECRET` to be set in
@@ -18,30 +17,8 @@ def test_binance_read_only_endpoints():
     read-only endpoints: balances, deposits, withdrawals and trades (when
     available). If credentials are missing the test will be skipped.
     """
-    if ccxt is None:
-        pytest.skip("ccxt not installed")
-
-    # Load .env if present so users can store keys there during local testing
-    load_dotenv()
-
-    api_key = os.getenv("BINANCE_API_KEY")
-    api_secret = os.getenv("BINANCE_API_SECRET")
-
-    if not api_key or not api_secret:
-        pytest.skip("BINANCE_API_KEY/BINANCE_API_SECRET not set in environment or .env")
-
-    # Create exchange instance (read-only by default; do not place orders)
-    exchange = ccxt.binance({
-        "apiKey": api_key,
-        "secret": api_secret,
-        "enableRateLimit": True,
-    })
-
-    # Basic connectivity: load markets
-    try:
-        exchange.load_markets()
-    except Exception as e:
-        pytest.skip(f"Unable to load markets from Binance: {e}")
+    # Shared read-only client; markets are already loaded by the fixture
+    exchange = binance_exchange
 
     # Fetch balances (read-only)
     try:
@@ -67,10 +44,9 @@ def test_binance_read_only_endpoints():
         except ccxt.BaseError:
             pytest.skip("fetch_withdrawals not supported or failed")
 
-    # Fetch recent trades for a market if possible
-    symbols = list(exchange.markets.keys()) if getattr(exchange, "markets", None) else []
-    if symbols:
-        symbol = symbols[0]
+    # Fetch recent trades for a commonly traded market if possible
+    symbol = pick_trades_symbol(exchange)
+    if symbol:
         if hasattr(exchange, "fetch_my_trades"):
             try:
                 trades = exchange.fetch_my_trades(symbol)
@@ -0,0 +1,15 @@
+from _ccxt_utils import normalize_ccxt_balance
+
+
+def test_normalize_ccxt_balance_unions_keys_and_drops_empty():
+    bal = {
+        "free": {"BTC": 0.5, "ETH": 0, "USDT": 10},
+        "used": {"BTC": 0.25, "DOGE": None},
+        "total": {"USDT": 12},
+        "info": {},
+    }
+    assert normalize_ccxt_balance(bal) == {
+        "BTC": {"free": "0.5", "locked": "0.25", "total": "0.75"},
+        "USDT": {"free": "10", "locked": "0", "total": "12"},
+    }
+    assert normalize_ccxt_balance(None) == {}
@@ -0,0 +1,35 @@
+import base64
+import hashlib
+
+from cryptography.fernet import Fernet
+
+from src.utils import crypto
+from src.utils.config_loader import ConfigLoader
+
+
+def test_round_trip_keeps_fernet_token_format():
+    token = crypto.encrypt_value("api-key")
+    # Same key derivation as earlier releases, so their tokens stay readable
+    raw = ConfigLoader().get_security_config().get("secret_key") or ""
+    legacy = Fernet(base64.urlsafe_b64encode(hashlib.sha256(raw.encode("utf-8")).digest()))
+    assert legacy.decrypt(token.encode("utf-8")) == b"api-key"
+    assert crypto.decrypt_value(legacy.encrypt(b"old-secret").decode("utf-8")) == "old-secret"
+    assert crypto.decrypt_many(crypto.encrypt_many(["a", "b"])) == ["a", "b"]
+
+
+def test_invalid_tokens_yield_none():
+    assert crypto.decrypt_value("garbage") is None
+    assert crypto.decrypt_many(["garbage", ""]) == [None, None]
+
+
+def test_config_is_read_once(monkeypatch):
+    crypto._get_fernet.cache_clear()
+    loads = []
+    real_loader = crypto.ConfigLoader
+    monkeypatch.setattr(crypto, "ConfigLoader", lambda: loads.append(1) or real_loader())
+    try:
+        crypto.decrypt_many(crypto.encrypt_many(["a", "b", "c"]))
+        crypto.decrypt_value(crypto.encrypt_value("d"))
+        assert len(loads) == 1
+    finally:
+        crypto._get_fernet.cache_clear()
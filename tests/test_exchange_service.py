@@ -0,0 +1,117 @@
+import asyncio
+from decimal import Decimal
+
+from src.database.models import ExchangeBalance, ExchangeDeposit, ExchangeTrade, ExchangeWithdrawal
+from src.services import exchange_service
+from src.services.exchange_service import ExchangeService
+from db_helpers import create_exchange_account
+
+
+def _make_service(monkeypatch, mgr):
+    # keep the price oracle off the network
+    monkeypatch.setattr(exchange_service, "get_prices", lambda *a, **k: {})
+    monkeypatch.setattr(exchange_service, "get_price_at", lambda *a, **k: None)
+    with mgr.session_context() as session:
+        acct_id = create_exchange_account(session).id
+    return ExchangeService(db_manager=mgr), mgr, acct_id
+
+
+def test_persist_balances_inserts_all_rows(monkeypatch, isolated_dbm):
+    svc, mgr, acct_id = _make_service(monkeypatch, isolated_dbm)
+    lookups = []
+
+    def fake_get_prices(symbols, vs_currencies):
+        lookups.append((sorted(symbols), tuple(vs_currencies)))
+        return {("BTC", "usd"): 40000.0}
+
+    monkeypatch.setattr(exchange_service, "get_prices", fake_get_prices)
+    svc.persist_balances(acct_id, {
+        "BTC": {"free": "0.5", "locked": "0.1", "total": "0.6"},
+        "ETH": {"free": "2", "locked": "0"},
+    })
+
+    with mgr.session_context() as session:
+        rows = {b.asset: b for b in session.query(ExchangeBalance).filter_by(exchange_account_id=acct_id)}
+        assert set(rows) == {"BTC", "ETH"}
+        assert rows["ETH"].total == Decimal("2")
+        assert rows["BTC"].total_usd == Decimal("24000")
+        assert rows["ETH"].total_usd is None
+    # every asset is priced by a single batched lookup
+    assert len(lookups) == 1 and lookups[0][0] == ["BTC", "ETH"] and lookups[0][1][0] == "usd"
+
+
+def test_persist_trades_and_deposits_dedupe_by_id(monkeypatch, isolated_dbm):
+    svc, mgr, acct_id = _make_service(monkeypatch, isolated_dbm)
+    trade = {"id": "t1", "symbol": "ETHUSDT", "price": "2000", "qty": "0.1", "timestamp": "2024-01-01T00:00:00"}
+    svc.persist_trades(acct_id, [trade, {"id": "t2", "symbol": "BTCUSDT", "price": "40000", "qty": "0.01"}])
+    # re-sync: t1 is updated in place, t3 is new, t3's duplicate within the batch is collapsed
+    svc.persist_trades(acct_id, [dict(trade, price="2100"), {"id": "t3", "symbol": "ETHUSDT"}, {"id": "t3", "symbol": "ETHUSDT"}])
+
+    deposit = {"id": "d1", "coin": "USDC", "amount": "100", "status": "pending"}
+    svc.persist_deposits(acct_id, [deposit])
+    svc.persist_deposits(acct_id, [dict(deposit, status="completed")])
+
+    with mgr.session_context() as session:
+        trades = {t.trade_id: t for t in session.query(ExchangeTrade).filter_by(exchange_account_id=acct_id)}
+        assert set(trades) == {"t1", "t2", "t3"}
+        assert trades["t1"].price == Decimal("2100")
+        deposits = session.query(ExchangeDeposit).filter_by(exchange_account_id=acct_id).all()
+        assert len(deposits) == 1 and deposits[0].status == "completed"
+
+
+def test_persist_all_writes_every_kind_in_one_call(monkeypatch, isolated_dbm):
+    svc, mgr, acct_id = _make_service(monkeypatch, isolated_dbm)
+    svc.persist_all(
+        acct_id,
+        balances={"ETH": {"free": "1", "locked": "0", "total": "1"}},
+        deposits=[{"id": "d1", "coin": "USDC", "amount": "100"}],
+        withdrawals=[{"id": "w1", "coin": "ETH", "amount": "0.1"}],
+        trades=[{"id": "t1", "symbol": "ETHUSDC", "price": "2000", "qty": "0.1"}],
+    )
+
+    with mgr.session_context() as session:
+        for model in (ExchangeBalance, ExchangeDeposit, ExchangeWithdrawal, ExchangeTrade):
+            assert session.query(model).filter_by(exchange_account_id=acct_id).count() == 1
+
+
+def test_persist_trades_consumes_a_generator_in_batches(monkeypatch, isolated_dbm):
+    svc, mgr, acct_id = _make_service(monkeypatch, isolated_dbm)
+    monkeypatch.setattr(exchange_service, "_TRADE_BATCH_SIZE", 2)
+    batches = []
+    write_trades = svc._write_trades
+    monkeypatch.setattr(svc, "_write_trades", lambda session, acct, batch: batches.append(len(batch)) or write_trades(session, acct, batch))
+
+    def pages():
+        for i in range(5):
+            yield {"id": f"t{i}", "symbol": "ETHUSDT", "price": "2000", "qty": "0.1"}
+        # a trade repeated in a later batch is updated, not duplicated
+        yield {"id": "t0", "symbol": "ETHUSDT", "price": "2500", "qty": "0.1"}
+
+    svc.persist_trades(acct_id, pages())
+
+    assert batches == [2, 2, 2]
+    with mgr.session_context() as session:
+        trades = {t.trade_id: t for t in session.query(ExchangeTrade).filter_by(exchange_account_id=acct_id)}
+        assert len(trades) == 5
+        assert trades["t0"].price == Decimal("2500")
+
+
+class _FakeAsyncExchange:
+    id = "fake"
+
+    async def fetch_my_trades(self):
+        await asyncio.sleep(0)
+        return [{"id": "t1", "symbol": "BTC/USDT", "side": "buy", "amount": 1, "price": 10, "timestamp": 1}]
+
+    async def fetch_deposits(self):
+        raise RuntimeError("not supported")
+
+    async def fetch_withdrawals(self):
+        return None
+
+
+def test_fetch_all_history_gathers_and_maps_failures_to_empty(monkeypatch, isolated_dbm, asyncio_runner):
+    svc, _, _ = _make_service(monkeypatch, isolated_dbm)
+    trades, deposits, withdrawals = asyncio_runner.run(svc.fetch_all_history(_FakeAsyncExchange()))
+    assert [t["id"] for t in trades] == ["t1"]
+    assert deposits == [] and withdrawals == []
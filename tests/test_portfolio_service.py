@@ -0,0 +1,37 @@
+from sqlalchemy import event
+
+from src.database.models import TransactionModel, WalletModel
+from src.services.portfolio_service import PortfolioService
+
+
+def test_get_wallets_counts_transactions_without_n_plus_one(isolated_dbm):
+    with isolated_dbm.session_context() as session:
+        for i in range(20):
+            wallet = WalletModel(address=f"0x{i:040x}", wallet_type="hot", network="ethereum" if i % 2 else "base")
+            session.add(wallet)
+            session.flush()
+            for n in range(i % 3):
+                session.add(TransactionModel(wallet_id=wallet.id, tx_hash=f"h{i}-{n}", tx_type="buy"))
+
+    statements = []
+
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append(statement)
+
+    engine = isolated_dbm.engine
+    event.listen(engine, "before_cursor_execute", _count)
+    try:
+        wallets = PortfolioService(isolated_dbm).get_wallets()
+    finally:
+        event.remove(engine, "before_cursor_execute", _count)
+
+    assert len(wallets) == 20
+    assert len(statements) == 1
+    counts = {w["address"]: w["transactions_count"] for w in wallets}
+    assert counts[f"0x{4:040x}"] == 1 and counts[f"0x{5:040x}"] == 2 and counts[f"0x{6:040x}"] == 0
+
+    svc = PortfolioService(isolated_dbm)
+    assert {w["network"] for w in svc.get_wallets(network="base")} == {"base"}
+    wallet_id = next(w["id"] for w in wallets if w["address"] == f"0x{5:040x}")
+    assert svc.get_wallet(wallet_id)["transactions_count"] == 2
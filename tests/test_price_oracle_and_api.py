@@ -1,6 +1,9 @@
+import asyncio
+import contextlib
+import re
 import time
+from datetime import timedelta
 import json
-from fastapi.testclient import TestClient
 from decimal import Decimal
 
 import src.database.manager as db_manager_mod
@@ -28,6 +31,43 @@ class DummyResponse:
             raise Exception(f"HTTP {self.status_code}")
 
 
+def _mock_session_get(routes, calls=None):
+    """Build a `_SESSION.get` stand-in from `(regex, payload)` routes; unmatched URLs get a 404.
+
+    Patterns are compiled once and tried in order, so each fake request is a
+    handful of regex searches instead of an if/elif ladder per test.
+    """
+    table = [(re.compile(pattern), payload) for pattern, payload in routes]
+
+    def mock_get(url, timeout=10, **kwargs):
+        if calls is not None:
+            calls.append(url)
+        for pattern, payload in table:
+            if pattern.search(url):
+                return DummyResponse(200, payload)
+        return DummyResponse(404, {})
+
+    return mock_get
+
+
+def _track_open_sessions(monkeypatch, mgr):
+    """Wrap `mgr.session_context`; the returned list holds the currently open sessions."""
+    open_sessions = []
+    real_session_context = mgr.session_context
+
+    @contextlib.contextmanager
+    def tracked_session_context():
+        with real_session_context() as session:
+            open_sessions.append(session)
+            try:
+                yield session
+            finally:
+                open_sessions.remove(session)
+
+    monkeypatch.setattr(mgr, "session_context", tracked_session_context)
+    return open_sessions
+
+
 def test_contract_resolution_and_price_fetch(monkeypatch):
     # Prepare in-memory DB and patch global manager
     mgr = _make_db_manager_inmemory()
@@ -37,25 +77,15 @@ def test_contract_resolution_and_price_fetch(monkeypatch):
     when_ts = int(time.time()) - 3600  # one hour ago
     key_ms = when_ts * 1000
 
-    # Prepare mocked requests.get behavior
-    def mock_get(url, timeout=10, **kwargs):
-        # contract lookup
-        if url.startswith("https://api.coingecko.com/api/v3/coins/ethereum/contract/"):
-            return DummyResponse(200, {"id": "mock-token"})
-
-        # market_chart/range
-        if "/market_chart/range" in url:
-            # return prices list containing a point near when_ts
-            prices = [[key_ms - 5000, 1.23], [key_ms, 1.5], [key_ms + 5000, 1.4]]
-            return DummyResponse(200, {"prices": prices})
-
-        # fallback history
-        if "/history" in url:
-            return DummyResponse(200, {"market_data": {"current_price": {"eur": 1.5}}})
-
-        return DummyResponse(404, {})
-
-    monkeypatch.setattr(price_oracle.requests, "get", mock_get)
+    # Prepare mocked HTTP session behavior: contract lookup, range, /history fallback
+    prices = [[key_ms - 5000, 1.23], [key_ms, 1.5], [key_ms + 5000, 1.4]]
+    calls = []
+    mock_get = _mock_session_get([
+        ("^" + re.escape(price_oracle._CONTRACT_URL.format(platform="ethereum", addr="")), {"id": "mock-token"}),
+        (r"/market_chart/range", {"prices": prices}),
+        (r"/history", {"market_data": {"current_price": {"eur": 1.5}}}),
+    ], calls)
+    monkeypatch.setattr(price_oracle._SESSION, "get", mock_get)
 
     # Call get_price_at with a contract address (starts with 0x)
     contract_addr = "0x" + "a" * 40
@@ -64,6 +94,14 @@ def test_contract_resolution_and_price_fetch(monkeypatch):
     # Assert we got the mocked price (nearest 1.5)
     assert price == 1.5
 
+    # a repeat lookup in the same minute is served from memory: no HTTP, no DB session
+    fetches = len(calls)
+    sessions = []
+    monkeypatch.setattr(price_oracle, "get_db_manager", lambda: sessions.append(mgr) or mgr)
+    assert price_oracle.get_price_at(contract_addr, when_ts + 1) == 1.5
+    assert len(calls) == fetches
+    assert sessions == []
+
     # Check that PriceMapping row was created
     with mgr.session_context() as session:
         pm = session.query(PriceMapping).filter_by(contract_address=contract_addr.lower()).first()
@@ -71,15 +109,210 @@ def test_contract_resolution_and_price_fetch(monkeypatch):
         assert pm.coingecko_id == "mock-token"
 
 
-def test_price_mappings_api_crud(monkeypatch):
-    # Setup in-memory DB
+def test_get_price_at_holds_no_session_during_http(monkeypatch):
+    mgr = _make_db_manager_inmemory()
+    monkeypatch.setattr(db_manager_mod, "_db_manager", mgr)
+    monkeypatch.setattr(price_oracle, "_ensure_rate_limit", lambda: None)
+
+    real_session_context = mgr.session_context
+    open_sessions = _track_open_sessions(monkeypatch, mgr)
+
+    when_ts = int(time.time()) - 7200
+    route = _mock_session_get([
+        (r"/contract/", {"id": "held-token"}),
+        (r"/market_chart/range", {"prices": [[when_ts * 1000, 2.5]]}),
+    ])
+    seen_open = []
+
+    def mock_get(url, timeout=10, **kwargs):
+        seen_open.append(len(open_sessions))
+        return route(url, timeout=timeout, **kwargs)
+
+    monkeypatch.setattr(price_oracle._SESSION, "get", mock_get)
+
+    assert price_oracle.get_price_at("0x" + "c" * 40, when_ts) == 2.5
+    assert seen_open and set(seen_open) == {0}
+
+    # mapping and price were persisted by the write session
+    with real_session_context() as session:
+        assert session.query(PriceMapping).filter_by(contract_address="0x" + "c" * 40).one().coingecko_id == "held-token"
+        assert session.query(PriceCache).filter_by(coingecko_id="held-token").count() == 1
+
+
+def test_unresolved_contract_is_negatively_cached(monkeypatch):
+    mgr = _make_db_manager_inmemory()
+    monkeypatch.setattr(db_manager_mod, "_db_manager", mgr)
+    monkeypatch.setattr(price_oracle, "_ensure_rate_limit", lambda: None)
+
+    calls = []
+    mock_get = _mock_session_get([], calls)
+    monkeypatch.setattr(price_oracle._SESSION, "get", mock_get)
+
+    contract_addr = "0x" + "b" * 40
+    assert price_oracle.get_price_at(contract_addr, int(time.time())) is None
+    probes = len(calls)
+    assert probes > 0
+
+    # repeat lookup is answered from the negative cache without any HTTP call
+    assert price_oracle.get_price_at(contract_addr, int(time.time())) is None
+    assert len(calls) == probes
+
+    # a sentinel row lets other workers skip the probe as well
+    with mgr.session_context() as session:
+        pm = session.query(PriceMapping).filter_by(contract_address=contract_addr.lower()).first()
+        assert pm is not None
+        assert pm.source == "negative"
+        assert pm.coingecko_id is None
+
+
+def test_contract_mapping_is_upserted_and_real_mapping_wins(monkeypatch):
+    mgr = _make_db_manager_inmemory()
+    address = "0x" + "d" * 40
+    old = price_oracle.now_utc() - timedelta(days=1)
+
+    with mgr.session_context() as session:
+        # a newer stale negative sentinel next to an older real mapping
+        session.add(PriceMapping(contract_address=address, coingecko_id=None, source="negative", created_at=price_oracle.now_utc()))
+        session.add(PriceMapping(contract_address=address, network="ethereum", coingecko_id="real-token", source="coin_gecko_contract", created_at=old))
+
+    with mgr.session_context() as session:
+        assert price_oracle._lookup_mapping(session, address).coingecko_id == "real-token"
+        # re-resolving updates the existing row and drops the sentinel
+        price_oracle._persist_mapping(session, address, "ethereum", "real-token-2", "coin_gecko_contract")
+        # a sentinel is not written while a real mapping exists
+        price_oracle._persist_mapping(session, address, None, None, "negative")
+
+    with mgr.session_context() as session:
+        rows = session.query(PriceMapping).filter_by(contract_address=address).all()
+        assert [(r.coingecko_id, r.source) for r in rows] == [("real-token-2", "coin_gecko_contract")]
+
+
+def test_get_prices_at_bulk_groups_range_fetches(monkeypatch):
     mgr = _make_db_manager_inmemory()
     monkeypatch.setattr(db_manager_mod, "_db_manager", mgr)
+    monkeypatch.setattr(price_oracle, "_ensure_rate_limit", lambda: None)
+    monkeypatch.setattr(price_oracle, "aiohttp", None)
 
-    # Import app lazily and test endpoints
-    from main import app
+    base_ts = 1600000020
+    base_ms = base_ts * 1000
+    calls = []
+    mock_get = _mock_session_get(
+        [(r"/market_chart/range", {"prices": [[base_ms - 30000, 10.0], [base_ms + 600000, 20.0]]})],
+        calls,
+    )
+    monkeypatch.setattr(price_oracle._SESSION, "get", mock_get)
 
-    client = TestClient(app)
+    prices = price_oracle.get_prices_at_bulk([("ETH", base_ts), ("eth", base_ts + 10), ("ETH", base_ts + 600)], vs_currency="eur")
+
+    assert prices == [10.0, 10.0, 20.0]
+    # both minute keys fall in one window -> a single range request
+    assert len(calls) == 1
+    with mgr.session_context() as session:
+        assert session.query(PriceCache).filter_by(coingecko_id="ethereum", vs_currency="eur").count() == 2
+
+
+def test_get_prices_at_bulk_holds_no_session_during_http(monkeypatch):
+    mgr = _make_db_manager_inmemory()
+    monkeypatch.setattr(db_manager_mod, "_db_manager", mgr)
+    monkeypatch.setattr(price_oracle, "_ensure_rate_limit", lambda: None)
+    monkeypatch.setattr(price_oracle, "aiohttp", None)
+    open_sessions = _track_open_sessions(monkeypatch, mgr)
+
+    base_ts = 1600100020
+    route = _mock_session_get([(r"/market_chart/range", {"prices": [[base_ts * 1000, 7.0]]})])
+    seen_open = []
+
+    def mock_get(url, timeout=10, **kwargs):
+        seen_open.append(len(open_sessions))
+        return route(url, timeout=timeout, **kwargs)
+
+    monkeypatch.setattr(price_oracle._SESSION, "get", mock_get)
+
+    assert price_oracle.get_prices_at_bulk([("BTC", base_ts)], vs_currency="eur") == [7.0]
+    assert seen_open == [0]
+
+
+def test_get_prices_at_bulk_falls_back_when_the_range_fetch_fails(monkeypatch):
+    mgr = _make_db_manager_inmemory()
+    monkeypatch.setattr(db_manager_mod, "_db_manager", mgr)
+
+    def broken_fetch(specs):
+        raise RuntimeError("network down")
+
+    monkeypatch.setattr(price_oracle, "_fetch_price_ranges", broken_fetch)
+    fallback_calls = []
+    monkeypatch.setattr(price_oracle, "get_price_at", lambda symbol, ts, vs=None: fallback_calls.append(symbol) or 3.0)
+
+    base_ts = 1600200020
+    assert price_oracle.get_prices_at_bulk([("BTC", base_ts), ("ETH", base_ts)], vs_currency="eur") == [3.0, 3.0]
+    assert sorted(fallback_calls) == ["BTC", "ETH"]
+
+
+def test_get_prices_at_bulk_inside_a_running_event_loop(monkeypatch, asyncio_runner):
+    mgr = _make_db_manager_inmemory()
+    monkeypatch.setattr(db_manager_mod, "_db_manager", mgr)
+    base_ts = 1600300020
+
+    async def fake_ranges_async(specs):
+        await asyncio.sleep(0)
+        return [[[base_ts * 1000, 4.0]] for _ in specs]
+
+    monkeypatch.setattr(price_oracle, "_fetch_price_ranges_async", fake_ranges_async)
+
+    async def caller():
+        # e.g. an async route calling the blocking helper directly
+        return price_oracle.get_prices_at_bulk([("BTC", base_ts)], vs_currency="eur")
+
+    assert asyncio_runner.run(caller()) == [4.0]
+
+
+def test_get_prices_batches_symbols_and_currencies(monkeypatch):
+    mgr = _make_db_manager_inmemory()
+    monkeypatch.setattr(db_manager_mod, "_db_manager", mgr)
+    price_oracle._LATEST_CACHE.clear()
+
+    calls = []
+    mock_get = _mock_session_get(
+        [(r"/simple/price\?ids=bitcoin,ethereum&vs_currencies=eur,usd$", {
+            "bitcoin": {"usd": 40000, "eur": 37000},
+            "ethereum": {"usd": 2000},
+        })],
+        calls,
+    )
+    monkeypatch.setattr(price_oracle._SESSION, "get", mock_get)
+
+    prices = price_oracle.get_prices(["eth", "BTC", "NOPE"], ("USD", "eur"))
+
+    assert len(calls) == 1
+    assert prices[("BTC", "eur")] == 37000.0
+    assert prices[("ETH", "usd")] == 2000.0
+    assert prices[("ETH", "eur")] is None
+    assert prices[("NOPE", "usd")] is None
+    # fresh entries are answered from memory; the DB cache holds the batch too
+    assert price_oracle.get_prices(["BTC"], ("usd",)) == {("BTC", "usd"): 40000.0}
+    assert len(calls) == 1
+    with mgr.session_context() as session:
+        assert session.query(PriceCache).filter_by(coingecko_id="bitcoin").count() == 2
+
+
+def test_price_cache_upsert_updates_existing_row():
+    mgr = _make_db_manager_inmemory()
+
+    with mgr.session_context() as session:
+        price_oracle._upsert_price_cache(session, "ethereum", "eur", 1700000040, 1.0)
+    with mgr.session_context() as session:
+        price_oracle._upsert_price_cache(session, "ethereum", "eur", 1700000040, 2.0)
+
+    with mgr.session_context() as session:
+        rows = session.query(PriceCache).filter_by(coingecko_id="ethereum", vs_currency="eur", ts_minute=1700000040).all()
+        assert len(rows) == 1
+        assert float(rows[0].price) == 2.0
+
+
+def test_price_mappings_api_crud(monkeypatch, client):
+    # Setup in-memory DB
+    mgr = _make_db_manager_inmemory()
+    monkeypatch.setattr(db_manager_mod, "_db_manager", mgr)
 
     payload = {
         "symbol": "TEST",
@@ -103,6 +336,11 @@ def test_price_mappings_api_crud(monkeypatch):
     assert data is not None
     assert data["coingecko_id"] == "test-token"
 
+    # List by symbol
+    resp = client.get("/v1/price-mappings/", params={"symbol": "test"})
+    assert resp.status_code == 200
+    assert [m["id"] for m in resp.json()] == [mapping_id]
+
     # Update mapping
     update_payload = {"symbol": "TEST2", "coingecko_id": "test-token-2", "source": "manual"}
     resp = client.put(f"/v1/price-mappings/{mapping_id}", json=update_payload)
@@ -0,0 +1,56 @@
+from datetime import datetime
+from decimal import Decimal
+
+from src.database.models import TaxRecordModel, TransactionModel, WalletModel
+from src.services.report_generator import ReportGenerator
+
+
+def _seed_tax_records(session, records):
+    wallet = WalletModel(address="0x" + "e" * 40, wallet_type="hot", network="ethereum")
+    session.add(wallet)
+    session.flush()
+    tx = TransactionModel(wallet_id=wallet.id, tx_hash="s1", tx_type="sell", created_at=datetime(2024, 3, 1))
+    session.add(tx)
+    session.flush()
+    for method, gain, year in records:
+        session.add(TaxRecordModel(
+            wallet_id=wallet.id, transaction_id=tx.id, gain_loss=Decimal(gain), cost_basis=Decimal("5"),
+            proceeds=Decimal(gain) + Decimal("5"), tax_method=method, year=year,
+        ))
+    return wallet.id
+
+
+def test_tax_report_summarizes_records_in_sql(isolated_dbm):
+    with isolated_dbm.session_context() as session:
+        wallet_id = _seed_tax_records(session, [("FIFO", "10", 2024), ("FIFO", "20", 2024), ("LIFO", "-5", 2024), ("FIFO", "99", 2023)])
+
+    gen = ReportGenerator(isolated_dbm)
+    report = gen.generate_tax_report(wallet_id, 2024)
+
+    assert report["summary"]["total_transactions"] == 3
+    assert Decimal(report["summary"]["total_gain_loss"]) == Decimal("25")
+    assert Decimal(report["summary"]["total_cost_basis"]) == Decimal("15")
+    assert Decimal(report["summary"]["total_proceeds"]) == Decimal("40")
+    assert report["by_method"]["FIFO"]["transaction_count"] == 2
+    assert Decimal(report["by_method"]["LIFO"]["gain_loss"]) == Decimal("-5")
+
+    fifo_only = gen.generate_tax_report(wallet_id, 2024, tax_method="FIFO")
+    assert set(fifo_only["by_method"]) == {"FIFO"}
+    assert Decimal(fifo_only["summary"]["total_gain_loss"]) == Decimal("30")
+
+    empty = gen.generate_tax_report(wallet_id, 2022)
+    assert empty["summary"]["total_transactions"] == 0
+    assert Decimal(empty["summary"]["total_gain_loss"]) == Decimal("0")
+
+
+def test_tax_report_totals_are_exact_to_the_cent(isolated_dbm):
+    # SQLite sums NUMERIC as floats; these values expose any float rounding
+    gains = ["0.10", "0.20", "1234567.01", "0.07", "99999999.99"] * 3
+    with isolated_dbm.session_context() as session:
+        wallet_id = _seed_tax_records(session, [("FIFO", g, 2024) for g in gains])
+
+    report = ReportGenerator(isolated_dbm).generate_tax_report(wallet_id, 2024)
+
+    assert Decimal(report["summary"]["total_gain_loss"]) == Decimal("303703702.11")
+    assert Decimal(report["summary"]["total_proceeds"]) == Decimal("303703777.11")
+    assert Decimal(report["by_method"]["FIFO"]["cost_basis"]) == Decimal("75")
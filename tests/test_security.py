@@ -0,0 +1,27 @@
+from src.auth.security import SecurityService, pwd_context
+
+
+def test_password_hashing_is_cheap_under_testing():
+    """conftest sets TESTING=1, so bcrypt runs at its minimum cost in the suite."""
+    hashed = SecurityService.hash_password("Testpass123!")
+
+    if hashed.startswith("$2"):
+        assert pwd_context.identify(hashed) == "bcrypt"
+        assert hashed.split("$")[2] == "04"
+    assert SecurityService.verify_password("Testpass123!", hashed)
+    assert not SecurityService.verify_password("wrong", hashed)
+
+
+def test_falsy_testing_values_keep_production_cost(monkeypatch):
+    from src.auth import security
+
+    for value in ("0", "false", "no", ""):
+        monkeypatch.setenv("TESTING", value)
+        assert not security._testing_enabled()
+        bcrypt_ctx, fallback_ctx = security._build_hash_contexts(security._testing_enabled())
+        assert bcrypt_ctx.to_dict()["bcrypt__rounds"] == 12
+        assert "sha256_crypt__rounds" not in fallback_ctx.to_dict()
+
+    for value in ("1", "true", "YES"):
+        monkeypatch.setenv("TESTING", value)
+        assert security._testing_enabled()
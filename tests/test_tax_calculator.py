@@ -0,0 +1,108 @@
+from datetime import datetime
+from decimal import Decimal
+
+from src.database.models import TaxRecordModel, TransactionModel, WalletModel
+from src.services.tax_calculator import TaxCalculator, _match_lots
+
+
+def _add_tx(session, wallet_id, tx_hash, tx_type, when, amount, price):
+    side = {"amount_out": amount, "price_usd_in": price} if tx_type == "buy" else {"amount_in": amount, "price_usd_out": price}
+    session.add(TransactionModel(wallet_id=wallet_id, tx_hash=tx_hash, tx_type=tx_type, token_in="ETH", token_out="ETH", created_at=when, **side))
+
+
+def test_match_lots_splits_sells_across_lot_boundaries():
+    lots = [Decimal("1"), Decimal("0"), Decimal("2"), Decimal("1")]
+    sells = [Decimal("0.5"), Decimal("2"), Decimal("0"), Decimal("2")]
+
+    assert list(_match_lots(lots, sells)) == [
+        (0, 0, Decimal("0.5")),
+        (1, 0, Decimal("0.5")),
+        (1, 2, Decimal("1.5")),
+        (3, 2, Decimal("0.5")),
+        (3, 3, Decimal("1")),
+        (3, -1, Decimal("0.5")),
+    ]
+
+
+def test_match_lots_skips_negative_lots():
+    # a negative lot must not pull later lot boundaries backwards
+    lots = [Decimal("1"), Decimal("-2"), Decimal("0"), Decimal("1")]
+
+    assert list(_match_lots(lots, [Decimal("1.5"), Decimal("1")])) == [
+        (0, 0, Decimal("1")),
+        (0, 3, Decimal("0.5")),
+        (1, 3, Decimal("0.5")),
+        (1, -1, Decimal("0.5")),
+    ]
+
+
+def test_calculate_fifo_uses_oldest_lots_first(isolated_dbm):
+    with isolated_dbm.session_context() as session:
+        wallet = WalletModel(address="0x" + "c" * 40, wallet_type="hot", network="ethereum")
+        session.add(wallet)
+        session.flush()
+        wallet_id = wallet.id
+        _add_tx(session, wallet_id, "b1", "buy", datetime(2024, 1, 1), Decimal("1"), Decimal("1000"))
+        _add_tx(session, wallet_id, "b2", "buy", datetime(2024, 2, 1), Decimal("1"), Decimal("2000"))
+        _add_tx(session, wallet_id, "s1", "sell", datetime(2024, 3, 1), Decimal("1.5"), Decimal("3000"))
+        # other years are ignored
+        _add_tx(session, wallet_id, "b0", "buy", datetime(2023, 6, 1), Decimal("5"), Decimal("1"))
+
+    result = TaxCalculator(isolated_dbm).calculate_fifo(wallet_id, 2024, token="ETH")
+
+    assert Decimal(result["total_cost_basis"]) == Decimal("2000")
+    assert Decimal(result["total_proceeds"]) == Decimal("4500")
+    assert Decimal(result["total_gain_loss"]) == Decimal("2500")
+    assert result["tax_records_count"] == 2
+    assert Decimal(result["estimated_tax_usd"]) == Decimal("525")
+    with isolated_dbm.session_context() as session:
+        assert session.query(TaxRecordModel).filter_by(wallet_id=wallet_id, tax_method="FIFO").count() == 2
+
+
+def test_annual_summary_aggregates_records_per_method(isolated_dbm):
+    with isolated_dbm.session_context() as session:
+        wallet = WalletModel(address="0x" + "d" * 40, wallet_type="hot", network="ethereum")
+        session.add(wallet)
+        session.flush()
+        wallet_id = wallet.id
+        _add_tx(session, wallet_id, "s1", "sell", datetime(2024, 3, 1), Decimal("1"), Decimal("10"))
+        session.flush()
+        tx_id = session.query(TransactionModel.id).filter_by(wallet_id=wallet_id).scalar()
+        for method, gain in (("FIFO", "10"), ("FIFO", "-4"), ("LIFO", "3"), ("FIFO", "100")):
+            session.add(TaxRecordModel(
+                wallet_id=wallet_id, transaction_id=tx_id, gain_loss=Decimal(gain), cost_basis=Decimal("1"),
+                proceeds=Decimal("2"), tax_method=method, year=2023 if gain == "100" else 2024,
+            ))
+
+    summary = TaxCalculator(isolated_dbm).get_annual_summary(wallet_id, 2024)
+
+    assert Decimal(summary["total_gain_loss"]) == Decimal("9")
+    assert set(summary["by_method"]) == {"FIFO", "LIFO"}
+    fifo = summary["by_method"]["FIFO"]
+    assert fifo["records_count"] == 2
+    assert Decimal(fifo["total_gain_loss"]) == Decimal("6")
+    assert Decimal(fifo["total_proceeds"]) == Decimal("4")
+
+
+def test_annual_summary_totals_are_exact_to_the_cent(isolated_dbm):
+    with isolated_dbm.session_context() as session:
+        wallet = WalletModel(address="0x" + "f" * 40, wallet_type="hot", network="ethereum")
+        session.add(wallet)
+        session.flush()
+        wallet_id = wallet.id
+        _add_tx(session, wallet_id, "s1", "sell", datetime(2024, 3, 1), Decimal("1"), Decimal("10"))
+        session.flush()
+        tx_id = session.query(TransactionModel.id).filter_by(wallet_id=wallet_id).scalar()
+        # float sums of these drift below the cent: 303703702.10999995
+        for gain in ["0.10", "0.20", "1234567.01", "0.07", "99999999.99"] * 3:
+            session.add(TaxRecordModel(
+                wallet_id=wallet_id, transaction_id=tx_id, gain_loss=Decimal(gain), cost_basis=Decimal("0.01"),
+                proceeds=Decimal(gain), tax_method="FIFO", year=2024,
+            ))
+
+    summary = TaxCalculator(isolated_dbm).get_annual_summary(wallet_id, 2024)
+
+    assert Decimal(summary["total_gain_loss"]) == Decimal("303703702.11")
+    fifo = summary["by_method"]["FIFO"]
+    assert Decimal(fifo["total_proceeds"]) == Decimal("303703702.11")
+    assert Decimal(fifo["total_cost_basis"]) == Decimal("0.15")